@@ -1,21 +1,195 @@
+import os
+import gzip
 import json
-from typing import Any, Dict
+import time
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from urllib.parse import urlparse
+from typing import Any, Callable, Dict, List, Optional
 from requests import Session, Response
 from requests.exceptions import ConnectionError, HTTPError
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-def get(
+
+def _json_dumps(payload: Dict[str, Any]) -> bytes:
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def _orjson_dumps(payload: Dict[str, Any]) -> bytes:
+    return orjson.dumps(payload)
+
+
+SERIALIZERS: Dict[str, Callable[[Dict[str, Any]], bytes]] = {"json": _json_dumps}
+if orjson is not None:
+    SERIALIZERS["orjson"] = _orjson_dumps
+
+_CONFIG = {
+    "serializer": "json",
+    "compress": False,
+    "compress_min_size": 1024,
+}
+_STATS = {
+    "requests": 0,
+    "payload_bytes": 0,
+    "wire_bytes": 0,
+}
+_STATS_LOCK = threading.Lock()
+
+# lifetime of cached sessions whose cookies have no expiry
+SESSION_CACHE_TTL = 12 * 60 * 60
+# cached sessions expiring in less than this are not reused
+SESSION_CACHE_MARGIN = 60
+
+
+def configure(
+    serializer: str = "auto",
+    compress: bool = False,
+    compress_min_size: int = 1024,
+) -> None:
+    """
+    Configures how request bodies are encoded.
+    `serializer` is one of `SERIALIZERS` or "auto" (orjson if installed, stdlib json otherwise).
+    With `compress`, bodies larger than `compress_min_size` bytes are gzip compressed.
+    """
+    if serializer == "auto":
+        serializer = "orjson" if "orjson" in SERIALIZERS else "json"
+    if serializer not in SERIALIZERS:
+        raise ValueError(f"Unknown serializer {serializer}, available: {list(SERIALIZERS)}")
+
+    _CONFIG["serializer"] = serializer
+    _CONFIG["compress"] = compress
+    _CONFIG["compress_min_size"] = compress_min_size
+
+
+def get_stats() -> Dict[str, int]:
+    """
+    Returns the number of requests sent and their body sizes before (payload) and after (wire) compression.
+    """
+    with _STATS_LOCK:
+        return dict(_STATS)
+
+
+def reset_stats() -> None:
+    with _STATS_LOCK:
+        for key in _STATS:
+            _STATS[key] = 0
+
+
+def format_stats(stats: Dict[str, int]) -> str:
+    return (
+        f"Sent {stats['requests']} requests, {stats['payload_bytes']} payload bytes, "
+        f"{stats['wire_bytes']} bytes on wire"
+    )
+
+
+def request(
     session: Session,
+    method: str,
     url: str,
     api_token: str,
     payload: Dict[str, Any],
+    relogin: bool = True,
 ) -> Response:
-    data = json.dumps(payload)
+    data = SERIALIZERS[_CONFIG["serializer"]](payload)
     headers = {
         "Content-Type": "application/json",
         "Authorization": f"Bearer {api_token}",
     }
-    response = session.get(url=url, data=data, headers=headers)
+
+    body = data
+    compressed = _CONFIG["compress"] and len(data) >= _CONFIG["compress_min_size"]
+    if compressed:
+        body = gzip.compress(data, compresslevel=6)
+        headers["Content-Encoding"] = "gzip"
+
+    response = send(session=session, method=method, url=url, body=body, headers=headers)
+
+    with _STATS_LOCK:
+        _STATS["requests"] += 1
+        _STATS["payload_bytes"] += len(data)
+        _STATS["wire_bytes"] += len(body)
+
+    if compressed and response.status_code == 415:
+        # the server doesn't accept compressed bodies, stop compressing
+        _CONFIG["compress"] = False
+        return request(
+            session=session,
+            method=method,
+            url=url,
+            api_token=api_token,
+            payload=payload,
+            relogin=relogin,
+        )
+
+    if relogin and is_auth_failure(session=session, url=url, response=response):
+        # the session expired, authenticate again and retry once
+        relogin_session(session)
+        return request(
+            session=session,
+            method=method,
+            url=url,
+            api_token=api_token,
+            payload=payload,
+            relogin=False,
+        )
+
+    return response
+
+
+def send(
+    session: Session,
+    method: str,
+    url: str,
+    body: bytes,
+    headers: Dict[str, str],
+) -> Response:
+    """
+    Sends a request, through the session's concurrency limiter (`session.dana_limiter`) if it has one,
+    in which case throttled (429/5xx) requests are retried after backing off.
+    """
+    limiter = getattr(session, "dana_limiter", None)
+    if limiter is None:
+        return session.request(method=method, url=url, data=body, headers=headers)
+
+    endpoint = urlparse(url).path
+    for retry in range(limiter.max_retries + 1):
+        with limiter.acquire(endpoint):
+            start = time.perf_counter()
+            response = session.request(method=method, url=url, data=body, headers=headers)
+            limiter.record(latency=time.perf_counter() - start, status_code=response.status_code)
+
+        if response.status_code != 429 and response.status_code < 500:
+            break
+
+        if retry < limiter.max_retries:
+            try:
+                delay = float(response.headers.get("Retry-After", 2**retry))
+            except ValueError:
+                delay = 2**retry
+            time.sleep(delay)
+
+    return response
+
+
+def get(
+    session: Session,
+    url: str,
+    api_token: str,
+    payload: Dict[str, Any],
+) -> Response:
+    response = request(
+        session=session,
+        method="GET",
+        url=url,
+        api_token=api_token,
+        payload=payload,
+    )
 
     code = response.status_code
     if code != 200:
@@ -30,13 +204,13 @@ def post(
     api_token: str,
     payload: Dict[str, Any],
 ) -> Response:
-    data = json.dumps(payload)
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_token}",
-    }
-
-    response = session.post(url=url, data=data, headers=headers)
+    response = request(
+        session=session,
+        method="POST",
+        url=url,
+        api_token=api_token,
+        payload=payload,
+    )
 
     code = response.status_code
     if code != 200:
@@ -45,13 +219,13 @@ def post(
     return response
 
 
-def login(
+def authenticate(
+    session: Session,
     url: str,
     api_token: str,
     username: str,
     password: str,
-) -> Session:
-    session = Session()
+) -> None:
     login_url = f"{url}/login"
     login_payload = {"username": username, "password": password}
 
@@ -65,9 +239,139 @@ def login(
     if login_response.url == login_url:
         raise ConnectionError(f"Login to {url} redirected to login page")
 
+
+def login(
+    url: str,
+    api_token: str,
+    username: str,
+    password: str,
+    cache_path: Optional[Path] = None,
+) -> Session:
+    """
+    Logs in to the Dana Server. The session remembers its credentials to re-authenticate once
+    when a request fails because it expired.
+    If `cache_path` is given, the session cookies are reused from (and saved to) that file.
+    """
+    session = Session()
+    session.dana_login = {
+        "url": url,
+        "api_token": api_token,
+        "username": username,
+        "password": password,
+        "cache_path": cache_path,
+        "lock": threading.Lock(),
+    }
+
+    if cache_path is not None and load_session_cache(session=session, cache_path=cache_path):
+        return session
+
+    authenticate(
+        session=session,
+        url=url,
+        api_token=api_token,
+        username=username,
+        password=password,
+    )
+
+    if cache_path is not None:
+        save_session_cache(session=session, cache_path=cache_path)
+
     return session
 
 
+def relogin_session(session: Session) -> None:
+    credentials = session.dana_login
+
+    with credentials["lock"]:
+        session.cookies.clear()
+        authenticate(
+            session=session,
+            url=credentials["url"],
+            api_token=credentials["api_token"],
+            username=credentials["username"],
+            password=credentials["password"],
+        )
+
+        if credentials["cache_path"] is not None:
+            save_session_cache(session=session, cache_path=credentials["cache_path"])
+
+
+def is_auth_failure(session: Session, url: str, response: Response) -> bool:
+    credentials = getattr(session, "dana_login", None)
+    if credentials is None:
+        return False
+
+    login_url = f"{credentials['url']}/login"
+    if url == login_url:
+        return False
+
+    # unauthenticated admin requests are redirected to the login page
+    return response.status_code in (401, 403) or response.url == login_url
+
+
+def _session_cache_key(session: Session) -> str:
+    credentials = session.dana_login
+    key = f"{credentials['url']}\n{credentials['username']}\n{credentials['password']}"
+
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def load_session_cache(session: Session, cache_path: Path) -> bool:
+    """
+    Loads the cached cookies into the session if they belong to the same server and credentials
+    and haven't expired. Returns whether the cache was used.
+    """
+    try:
+        cache = json.load(open(cache_path))
+    except (OSError, ValueError):
+        return False
+
+    if cache.get("key") != _session_cache_key(session):
+        return False
+    if cache.get("expires", 0) < time.time() + SESSION_CACHE_MARGIN:
+        return False
+
+    for cookie in cache["cookies"]:
+        session.cookies.set(**cookie)
+
+    return True
+
+
+def save_session_cache(session: Session, cache_path: Path) -> None:
+    """
+    Saves the session cookies and their expiry to a file only readable by the current user.
+    """
+    cookies = [
+        {
+            "name": cookie.name,
+            "value": cookie.value,
+            "domain": cookie.domain,
+            "path": cookie.path,
+            "expires": cookie.expires,
+            "secure": cookie.secure,
+        }
+        for cookie in session.cookies
+    ]
+    expiries = [cookie["expires"] for cookie in cookies if cookie["expires"] is not None]
+    cache = {
+        "key": _session_cache_key(session),
+        "expires": min(expiries) if expiries else time.time() + SESSION_CACHE_TTL,
+        "cookies": cookies,
+    }
+
+    cache_path = Path(cache_path)
+    cache_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    # a unique temp file (created 0600), processes sharing the cache may save it concurrently
+    fd, tmp_path = tempfile.mkstemp(dir=cache_path.parent, prefix=f".{cache_path.name}.")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
 def add_project(
     url: str,
     session: Session,
@@ -107,6 +411,7 @@ def add_build(
     build_author_name: str = "",
     build_author_email: str = "",
     override: bool = False,
+    build_fingerprint: Optional[Dict[str, Any]] = None,
 ) -> Response:
     build_url = f"{url}/apis/addBuild"
     build_payload = {
@@ -124,6 +429,8 @@ def add_build(
         },
         "override": override,
     }
+    if build_fingerprint is not None:
+        build_payload["build"]["infos"]["fingerprint"] = build_fingerprint
 
     build_response = post(
         session=session,
@@ -245,3 +552,93 @@ def build_exists(
         return len(build_response) > 0
     except Exception:
         return False
+
+
+def get_series(
+    url: str,
+    session: Session,
+    api_token: str,
+    project_id: str,
+    series_id: str,
+) -> Optional[Dict[str, Any]]:
+    series_url = f"{url}/apis/getSerie"
+    series_payload = {"projectId": project_id, "serieId": series_id}
+
+    try:
+        series_response = get(
+            session=session,
+            url=series_url,
+            api_token=api_token,
+            payload=series_payload,
+        )
+        series_response = series_response.json()
+    except (HTTPError, ValueError):
+        return None
+
+    if not series_response:
+        return None
+
+    return series_response
+
+
+def get_builds(
+    url: str,
+    session: Session,
+    api_token: str,
+    project_id: str,
+    start: int = 0,
+    count: int = 100,
+) -> List[Dict[str, Any]]:
+    """
+    Returns a page of `count` builds of a project, starting at the `start`-th build.
+    """
+    builds_url = f"{url}/apis/getBuilds"
+    builds_payload = {"projectId": project_id, "start": start, "count": count}
+
+    builds_response = get(
+        session=session,
+        url=builds_url,
+        api_token=api_token,
+        payload=builds_payload,
+    )
+
+    return builds_response.json() or []
+
+
+def get_series_ids(
+    url: str,
+    session: Session,
+    api_token: str,
+    project_id: str,
+    start: int = 0,
+    count: int = 100,
+) -> List[str]:
+    """
+    Returns a page of `count` series ids of a project, starting at the `start`-th series.
+    """
+    series_url = f"{url}/apis/getSeries"
+    series_payload = {"projectId": project_id, "start": start, "count": count}
+
+    series_response = get(
+        session=session,
+        url=series_url,
+        api_token=api_token,
+        payload=series_payload,
+    )
+
+    return [
+        series if isinstance(series, str) else series["serieId"]
+        for series in series_response.json() or []
+    ]
+
+
+def get_series_samples(series: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Extracts the {build_id: value} samples of a series returned by `get_series`.
+    """
+    samples = series.get("samples", {}) or {}
+
+    if isinstance(samples, list):
+        return {str(sample["buildId"]): sample["value"] for sample in samples}
+
+    return {str(build_id): value for build_id, value in samples.items()}
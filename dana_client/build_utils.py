@@ -1,8 +1,21 @@
 import json
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from requests import Session
+from typing import Any, Dict, List, Optional
 
 from .api import add_project, add_build, add_series, add_sample, project_exists
+from .store import connect_store, add_build_samples
+from .regression import analyse_build
+from .sync import diff_build, format_sync_plan
+from .mirrors import publish_to_targets
+from .fingerprint import get_fingerprint_class, load_fingerprint, namespace_series
+from .repetitions import (
+    aggregate_values,
+    coefficient_of_variation,
+    find_repetitions,
+    get_series_range,
+)
 
 import pandas as pd
 from omegaconf import OmegaConf
@@ -25,9 +38,12 @@ def upload_build(
     build_author_name: str,
     build_author_email: str,
     build_subject: str,
+    reused_from: Optional[str] = None,
 ) -> None:
     """
     Uploads the folder to the HuggingFace dataset.
+    `reused_from` is the build whose results were reused for this build, if any.
+    The runner fingerprint of the folder, if any, is recorded in `build_info.json`.
     """
     build_info = {
         "build_url": build_url,
@@ -37,6 +53,11 @@ def upload_build(
         "build_author_name": build_author_name,
         "build_author_email": build_author_email,
     }
+    if reused_from is not None:
+        build_info["reused_from"] = reused_from
+    fingerprint = load_fingerprint(folder)
+    if fingerprint is not None:
+        build_info["fingerprint"] = fingerprint
 
     json.dump(build_info, open(folder / "build_info.json", "w"))
 
@@ -50,6 +71,70 @@ def upload_build(
     )
 
 
+# (results column, series suffix, unit, trend, scale)
+METRICS = [
+    ("forward.latency(s)", "latency(ms)", "ms", "smaller", 1000),
+    ("forward.peak_memory(MB)", "memory(mbytes)", "mbytes", "smaller", 1),
+    ("generate.throughput(tokens/s)", "throughput(tokens)", "tokens", "higher", 1),
+]
+
+
+def parse_build(folder: Path, aggregation: str = "median") -> List[Dict[str, Any]]:
+    """
+    Parses the benchmark results of a build folder into a list of series samples.
+    Repeated runs of a benchmark are aggregated with `aggregation` and their dispersion
+    is published as a `<series>_cv(%)` series tagged as `companion`: it's informative only and
+    is neither analysed for regressions nor alerted on (see `repetitions.COMPANION_RANGE`).
+    """
+    series = []
+    for benchmark_foler in sorted(folder.iterdir()):
+        if not benchmark_foler.is_dir():
+            continue
+
+        inference_results = find_repetitions(benchmark_foler)
+        hydra_config = sorted(benchmark_foler.glob("**/hydra_config.yaml"))
+
+        if inference_results is None or len(hydra_config) != len(inference_results):
+            continue
+
+        inference_results = [
+            pd.read_csv(results).to_dict(orient="records")[0] for results in inference_results
+        ]
+        series_description = OmegaConf.to_yaml(OmegaConf.load(hydra_config[0])).replace(
+            "\n", "<br>"
+        )
+
+        for column, suffix, unit, trend, scale in METRICS:
+            if column not in inference_results[0]:
+                continue
+
+            values = [results[column] * scale for results in inference_results]
+            series_id = f"{benchmark_foler.name}_{suffix}"
+            series.append(
+                {
+                    "series_id": series_id,
+                    "series_unit": unit,
+                    "series_description": series_description,
+                    "benchmark_trend": trend,
+                    "sample_value": aggregate_values(values, aggregation),
+                }
+            )
+
+            if len(values) > 1:
+                series.append(
+                    {
+                        "series_id": f"{series_id}_cv(%)",
+                        "series_unit": "%",
+                        "series_description": series_description,
+                        "benchmark_trend": "smaller",
+                        "sample_value": coefficient_of_variation(values),
+                        "companion": True,
+                    }
+                )
+
+    return series
+
+
 def publish_build(
     folder: Path,
     url: str,
@@ -65,142 +150,175 @@ def publish_build(
     build_subject: str = "",
     average_range: str = "5%",
     average_min_count: int = 3,
-) -> None:
+    store_path: Optional[Path] = None,
+    sync: bool = False,
+    dry_run: bool = False,
+    sync_tolerance: float = 1e-6,
+    max_workers: int = 1,
+    aggregation: str = "median",
+    mirrors: Optional[List[Dict[str, Any]]] = None,
+    fingerprint_series: bool = False,
+) -> Optional[pd.DataFrame]:
     """
     Publishes the build to the Dana Server.
+    If `store_path` is given, the build is first analysed for regressions against the history
+    in the local results store, its samples are written to the store and the regression report is returned.
+    With `sync`, only the project, build, series and samples that are missing or different on the server
+    are sent. With `dry_run`, the sync plan is printed and nothing is sent.
+    Repeated runs of a benchmark are aggregated with `aggregation` (see `parse_build`).
+    Series are published by `max_workers` threads (see `concurrency.AdaptiveLimiter` to adapt the
+    number of requests in flight to the server load).
+    The build is parsed once and also published concurrently to the `mirrors` servers
+    (see `mirrors.login_mirrors`); a server failing doesn't stop the others.
+    The runner fingerprint of the folder is published with the build and, with `fingerprint_series`,
+    the series ids are suffixed with its class so that different runner types aren't compared.
     """
-    p_exists = project_exists(
-        session=session,
-        url=url,
-        api_token=api_token,
-        project_id=project_id,
-    )
-    if not p_exists:
-        add_project(
-            session=session,
-            url=url,
-            api_token=api_token,
-            project_id=project_id,
-            users="",
-            project_description="",
-            override=True,
-        )
+    series = parse_build(folder, aggregation=aggregation)
 
-    add_build(
-        session=session,
-        url=url,
-        api_token=api_token,
-        project_id=project_id,
-        build_id=build_id,
-        build_url=build_url,
-        build_hash=build_hash,
-        build_subject=build_subject,
-        build_abbrev_hash=build_abbrev_hash,
-        build_author_name=build_author_name,
-        build_author_email=build_author_email,
-        override=True,
-    )
-    for benchmark_foler in folder.iterdir():
-        if not benchmark_foler.is_dir():
-            continue
-
-        inference_results = list(benchmark_foler.glob("**/inference_results.csv"))
-        hydra_config = list(benchmark_foler.glob("**/hydra_config.yaml"))
+    fingerprint = load_fingerprint(folder)
+    if fingerprint_series and fingerprint is not None:
+        series = namespace_series(series, get_fingerprint_class(fingerprint))
 
-        if len(inference_results) != 1 or len(hydra_config) != 1:
-            continue
+    # the companion series are neither analysed nor kept in the local store
+    analysed_series = [s for s in series if not s.get("companion")]
 
-        inference_results = pd.read_csv(inference_results[0]).to_dict(orient="records")
-        series_description = OmegaConf.to_yaml(OmegaConf.load(hydra_config[0])).replace(
-            "\n", "<br>"
-        )
-
-        # Latency series
-        latency_ms = inference_results[0]["forward.latency(s)"] * 1000
-        series_id = f"{benchmark_foler.name}_latency(ms)"
-        add_series(
-            session=session,
-            api_token=api_token,
-            url=url,
+    report = None
+    if store_path is not None:
+        connection = connect_store(store_path)
+        report = analyse_build(
+            connection=connection,
             project_id=project_id,
-            series_id=series_id,
-            series_unit="ms",
-            series_description=series_description,
+            build_id=build_id,
+            series=analysed_series,
             benchmark_range=average_range,
             benchmark_required=average_min_count,
-            benchmark_trend="smaller",
-            override=True,
-        )
-
-        add_sample(
-            session=session,
-            url=url,
-            api_token=api_token,
-            project_id=project_id,
-            build_id=build_id,
-            series_id=series_id,
-            sample_value=latency_ms,
-            sample_unit="ms",
-            override=True,
         )
+        connection.close()
 
-        # Memory series
-        if "forward.peak_memory(MB)" in inference_results[0]:
-            memory_mb = inference_results[0]["forward.peak_memory(MB)"]
+    def publish_target(target: Dict[str, Any]) -> None:
+        url, session, api_token = target["url"], target["session"], target["api_token"]
 
-            series_id = f"{benchmark_foler.name}_memory(mbytes)"
-            add_series(
-                session=session,
+        if sync or dry_run:
+            plan = diff_build(
                 url=url,
+                session=session,
                 api_token=api_token,
                 project_id=project_id,
-                series_id=series_id,
-                series_unit="mbytes",
-                series_description=series_description,
-                benchmark_range=average_range,
-                benchmark_required=average_min_count,
-                benchmark_trend="smaller",
-                override=True,
+                build_id=build_id,
+                series=series,
+                average_range=average_range,
+                average_min_count=average_min_count,
+                tolerance=sync_tolerance,
+                max_workers=max_workers,
             )
-            add_sample(
+            print(f"Sync plan for build {build_id} of {project_id} on {url}:")
+            print(format_sync_plan(plan))
+
+            if dry_run:
+                return
+        else:
+            p_exists = project_exists(
                 session=session,
                 url=url,
                 api_token=api_token,
                 project_id=project_id,
-                build_id=build_id,
-                series_id=series_id,
-                sample_value=memory_mb,
-                sample_unit="mbytes",
-                override=True,
             )
+            plan = {
+                "add_project": not p_exists,
+                "add_build": True,
+                "add_series": [s["series_id"] for s in series],
+                "add_sample": [s["series_id"] for s in series],
+            }
 
-        # Throughput series
-        if "generate.throughput(tokens/s)" in inference_results[0]:
-            throughput_tok_s = inference_results[0]["generate.throughput(tokens/s)"]
-
-            series_id = f"{benchmark_foler.name}_throughput(tokens)"
-            add_series(
+        if plan["add_project"]:
+            add_project(
                 session=session,
                 url=url,
                 api_token=api_token,
                 project_id=project_id,
-                series_id=series_id,
-                series_unit="tokens",
-                series_description=series_description,
-                benchmark_range=average_range,
-                benchmark_required=average_min_count,
-                benchmark_trend="higher",
+                users="",
+                project_description="",
                 override=True,
             )
 
-            add_sample(
+        if plan["add_build"]:
+            add_build(
                 session=session,
                 url=url,
                 api_token=api_token,
                 project_id=project_id,
                 build_id=build_id,
-                series_id=series_id,
-                sample_value=throughput_tok_s,
-                sample_unit="tokens",
+                build_url=build_url,
+                build_hash=build_hash,
+                build_subject=build_subject,
+                build_abbrev_hash=build_abbrev_hash,
+                build_author_name=build_author_name,
+                build_author_email=build_author_email,
+                build_fingerprint=fingerprint,
                 override=True,
             )
+
+        add_series_ids = set(plan["add_series"])
+        add_sample_ids = set(plan["add_sample"])
+
+        def publish_series(s: Dict[str, Any]) -> None:
+            if s["series_id"] in add_series_ids:
+                add_series(
+                    session=session,
+                    url=url,
+                    api_token=api_token,
+                    project_id=project_id,
+                    series_id=s["series_id"],
+                    series_unit=s["series_unit"],
+                    series_description=s["series_description"],
+                    benchmark_range=get_series_range(s, average_range),
+                    benchmark_required=average_min_count,
+                    benchmark_trend=s["benchmark_trend"],
+                    override=True,
+                )
+            if s["series_id"] in add_sample_ids:
+                add_sample(
+                    session=session,
+                    url=url,
+                    api_token=api_token,
+                    project_id=project_id,
+                    build_id=build_id,
+                    series_id=s["series_id"],
+                    sample_value=s["sample_value"],
+                    sample_unit=s["series_unit"],
+                    override=True,
+                )
+
+        # series are independent, a sample is always sent after its series
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(publish_series, series))
+
+    publish_to_targets(
+        targets=[{"url": url, "session": session, "api_token": api_token}] + (mirrors or []),
+        publish=publish_target,
+        label=f"build {build_id} of {project_id}",
+    )
+
+    if dry_run:
+        return report
+
+    if store_path is not None:
+        connection = connect_store(store_path)
+        add_build_samples(
+            connection=connection,
+            project_id=project_id,
+            build_id=build_id,
+            series=analysed_series,
+            build_url=build_url,
+            build_hash=build_hash,
+            build_subject=build_subject,
+            build_abbrev_hash=build_abbrev_hash,
+            build_author_name=build_author_name,
+            build_author_email=build_author_email,
+            average_range=average_range,
+            average_min_count=average_min_count,
+            fingerprint=fingerprint,
+        )
+        connection.close()
+
+    return report
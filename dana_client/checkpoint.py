@@ -0,0 +1,100 @@
+import os
+import json
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# entries of the experiments folder that don't belong to a config
+RESERVED_ARTIFACTS = ["failures.json", "build_info.json", "fingerprint.json"]
+
+
+def get_journal_path(checkpoint_dir: Path, project_id: str, build_id: str) -> Path:
+    return Path(checkpoint_dir) / project_id / f"{build_id}.json"
+
+
+def load_journal(journal_path: Path) -> Dict[str, Any]:
+    return json.load(open(journal_path))
+
+
+def save_journal(journal_path: Path, journal: Dict[str, Any]) -> None:
+    """
+    Atomically replaces the journal, so that a crash leaves either the old or the new journal.
+    """
+    journal_path = Path(journal_path)
+    journal_path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_path = journal_path.with_name(f".{journal_path.name}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(journal, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, journal_path)
+
+    # persist the rename
+    dir_fd = os.open(journal_path.parent, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def start_journal(journal_path: Path, build_hash: str, folder: Path) -> Dict[str, Any]:
+    """
+    Resumes the journal of a build, removing the artifacts of the folder that no completed config
+    claims (e.g. the partial results of a config that was interrupted). The failed configs of a
+    build that wasn't uploaded yet are forgotten so that they are rerun. Starts a new journal and
+    an empty folder if there is no journal for this build hash.
+    """
+    journal = None
+    if Path(journal_path).exists():
+        try:
+            journal = load_journal(journal_path)
+        except ValueError:
+            journal = None
+
+    if journal is None or journal.get("build_hash") != build_hash:
+        shutil.rmtree(folder, ignore_errors=True)
+        journal = {"build_hash": build_hash, "configs": {}, "stages": []}
+        save_journal(journal_path, journal)
+        return journal
+
+    if not journal["stages"]:
+        # the configs that were given up are retried, their failure may have been transient
+        journal["configs"] = {
+            name: config for name, config in journal["configs"].items() if not config["failure"]
+        }
+        save_journal(journal_path, journal)
+
+    claimed = {a for config in journal["configs"].values() for a in config["artifacts"]}
+    if Path(folder).exists():
+        for artifact in Path(folder).iterdir():
+            if artifact.name in claimed or artifact.name in RESERVED_ARTIFACTS:
+                continue
+            if artifact.is_dir():
+                shutil.rmtree(artifact)
+            else:
+                artifact.unlink()
+
+    print(f"Resuming from checkpoint with {len(journal['configs'])} completed configs")
+
+    return journal
+
+
+def record_config(
+    journal_path: Path,
+    config_name: str,
+    artifacts: List[str],
+    failure: Optional[Dict[str, Any]] = None,
+) -> None:
+    """
+    Records a completed (or given up) config and the folder artifacts it produced.
+    """
+    journal = load_journal(journal_path)
+    journal["configs"][config_name] = {"artifacts": sorted(artifacts), "failure": failure}
+    save_journal(journal_path, journal)
+
+
+def record_stage(journal_path: Path, stage: str) -> None:
+    journal = load_journal(journal_path)
+    journal["stages"].append(stage)
+    save_journal(journal_path, journal)
@@ -0,0 +1,158 @@
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class TokenBucket:
+    """
+    Caps the rate of requests to `rate` per second, allowing bursts of `burst` requests.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.burst
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Blocks until a token is available and returns the time spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+class AdaptiveLimiter:
+    """
+    Limits the number of in-flight requests with an AIMD controller: the limit grows by one every
+    `limit` successful requests and is multiplied by `backoff` when the server answers 429/5xx or
+    when the latency exceeds `latency_tolerance` times the lowest latency observed recently.
+    Optional token buckets cap the request rate per endpoint (url path).
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        initial_limit: Optional[int] = None,
+        backoff: float = 0.5,
+        latency_tolerance: float = 2.0,
+        rate_limits: Optional[Dict[str, float]] = None,
+        max_retries: int = 3,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(initial_limit if initial_limit is not None else min(2, max_limit))
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.max_retries = max_retries
+        self.buckets = {
+            endpoint: TokenBucket(rate) for endpoint, rate in (rate_limits or {}).items()
+        }
+
+        self.in_flight = 0
+        self.base_latency = None
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+        self.stats = {
+            "requests": 0,
+            "throttled": 0,
+            "slow": 0,
+            "increases": 0,
+            "decreases": 0,
+            "peak_limit": int(self.limit),
+            "lowest_limit": int(self.limit),
+            "rate_limited_seconds": 0.0,
+        }
+
+    @contextmanager
+    def acquire(self, endpoint: str) -> Iterator[None]:
+        bucket = self.buckets.get(endpoint)
+        if bucket is not None:
+            waited = bucket.acquire()
+            with self.condition:
+                self.stats["rate_limited_seconds"] += waited
+
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.in_flight -= 1
+                self.condition.notify_all()
+
+    def record(self, latency: float, status_code: int) -> None:
+        """
+        Updates the limit with the outcome of a request.
+        """
+        with self.condition:
+            self.stats["requests"] += 1
+
+            throttled = status_code == 429 or status_code >= 500
+            if not throttled:
+                # slowly forget the lowest latency so that the baseline follows the server load
+                if self.base_latency is None or latency < self.base_latency:
+                    self.base_latency = latency
+                else:
+                    self.base_latency = 0.99 * self.base_latency + 0.01 * latency
+            slow = not throttled and latency > self.latency_tolerance * self.base_latency
+
+            if throttled or slow:
+                self.stats["throttled" if throttled else "slow"] += 1
+                # decrease at most once per round trip, requests in flight saw the same congestion
+                now = time.monotonic()
+                if now - self.last_decrease > latency:
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self.last_decrease = now
+                    self.stats["decreases"] += 1
+                    self.stats["lowest_limit"] = min(self.stats["lowest_limit"], int(self.limit))
+            elif self.limit < self.max_limit:
+                previous_limit = int(self.limit)
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                if int(self.limit) > previous_limit:
+                    self.stats["increases"] += 1
+                    self.stats["peak_limit"] = max(self.stats["peak_limit"], int(self.limit))
+
+            self.condition.notify_all()
+
+    def summary(self) -> Dict[str, Any]:
+        with self.condition:
+            return {"limit": int(self.limit), **self.stats}
+
+
+def format_limiter_summary(summary: Dict[str, Any]) -> str:
+    return (
+        f"Concurrency limit {summary['limit']} (peak {summary['peak_limit']}, "
+        f"lowest {summary['lowest_limit']}), {summary['increases']} increases, "
+        f"{summary['decreases']} decreases, {summary['throttled']} throttled and "
+        f"{summary['slow']} slow responses over {summary['requests']} requests, "
+        f"{summary['rate_limited_seconds']:.1f}s waiting on rate limits"
+    )
+
+
+def parse_rate_limits(rate_limits: Optional[List[str]]) -> Dict[str, float]:
+    """
+    Parses ["/apis/addSample=50", ...] into {"/apis/addSample": 50.0, ...}.
+    """
+    parsed = {}
+    for rate_limit in rate_limits or []:
+        endpoint, rate = rate_limit.rsplit("=", 1)
+        parsed[endpoint] = float(rate)
+
+    return parsed
@@ -0,0 +1,350 @@
+import os
+import json
+import time
+import uuid
+import shutil
+from pathlib import Path
+from requests import Session
+from argparse import ArgumentParser
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .api import (
+    login,
+    configure,
+    get_builds,
+    get_series,
+    get_series_ids,
+    get_series_samples,
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# last exported build of each project, used for incremental exports
+STATE_FILE = "export_state.json"
+TABLES = ["builds", "samples"]
+
+BUILDS_COLUMNS = [
+    ("build_id", "int64"),
+    ("build_url", "string"),
+    ("build_hash", "string"),
+    ("build_subject", "string"),
+    ("build_abbrev_hash", "string"),
+    ("build_author_name", "string"),
+    ("build_author_email", "string"),
+]
+SAMPLES_COLUMNS = [
+    ("series_id", "string"),
+    ("build_id", "int64"),
+    ("sample_value", "float64"),
+]
+
+
+def iter_pages(fetch: Callable[[int, int], List[Any]], page_size: int = 100) -> Iterator[Any]:
+    """
+    Iterates over the items of a paginated read, `fetch(start, count)`, until a page isn't full.
+    """
+    start = 0
+    while True:
+        page = fetch(start, page_size)
+        yield from page
+        if len(page) < page_size:
+            return
+        start += page_size
+
+
+class PartitionWriter:
+    """
+    Streams record batches to a Parquet file of a hive partition, e.g. `builds/project_id=<id>/`.
+    The file is written to a hidden temp file and only renamed to its final name by `commit`, so
+    that an interrupted export leaves no readable partial file.
+    """
+
+    def __init__(self, path: Path, columns: List[Tuple[str, str]]):
+        self.path = Path(path)
+        self.tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        self.schema = pa.schema([(name, pa.type_for_alias(dtype)) for name, dtype in columns])
+        self.writer = None
+        self.num_rows = 0
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        if self.writer is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.writer = pq.ParquetWriter(str(self.tmp_path), self.schema)
+        self.writer.write_table(pa.Table.from_pylist(rows, schema=self.schema))
+        self.num_rows += len(rows)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+    def commit(self) -> None:
+        if self.writer is not None:
+            os.replace(self.tmp_path, self.path)
+
+    def discard(self) -> None:
+        self.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+
+def iter_series(
+    url: str,
+    session: Session,
+    api_token: str,
+    project_id: str,
+    page_size: int = 100,
+    max_workers: int = 4,
+) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+    """
+    Fetches the series of a project with `max_workers` concurrent reads,
+    keeping a bounded number of series in memory.
+    """
+    series_ids = iter_pages(
+        lambda start, count: get_series_ids(
+            url=url,
+            session=session,
+            api_token=api_token,
+            project_id=project_id,
+            start=start,
+            count=count,
+        ),
+        page_size=page_size,
+    )
+
+    def fetch(series_id: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        series = get_series(
+            url=url,
+            session=session,
+            api_token=api_token,
+            project_id=project_id,
+            series_id=series_id,
+        )
+        return series_id, series
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        for series_id in series_ids:
+            pending.add(executor.submit(fetch, series_id))
+            if len(pending) >= 2 * max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+        for future in pending:
+            yield future.result()
+
+
+def export_project(
+    url: str,
+    session: Session,
+    api_token: str,
+    project_id: str,
+    output_dir: Path,
+    since_build: Optional[int] = None,
+    page_size: int = 100,
+    max_workers: int = 4,
+) -> Optional[int]:
+    """
+    Exports the builds and samples of a project newer than `since_build` to a new part of the
+    `output_dir/{builds,samples}/project_id=<project_id>/` Parquet partitions.
+    If `since_build` is None, the partitions are replaced by a full export.
+    Both parts are only added (and the old partitions only removed) once all the builds and samples
+    were fetched, so that a failed export leaves the previous one untouched.
+    Returns the last exported build id.
+    """
+    if pa is None:
+        raise ImportError("Exporting to Parquet requires pyarrow: pip install dana-client[export]")
+
+    part_name = f"part-{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet"
+    partitions = [Path(output_dir) / table / f"project_id={project_id}" for table in TABLES]
+    builds_writer = PartitionWriter(partitions[0] / part_name, columns=BUILDS_COLUMNS)
+    samples_writer = PartitionWriter(partitions[1] / part_name, columns=SAMPLES_COLUMNS)
+
+    try:
+        last_build = write_project_parts(
+            url=url,
+            session=session,
+            api_token=api_token,
+            project_id=project_id,
+            builds_writer=builds_writer,
+            samples_writer=samples_writer,
+            since_build=since_build,
+            page_size=page_size,
+            max_workers=max_workers,
+        )
+    except BaseException:
+        builds_writer.discard()
+        samples_writer.discard()
+        raise
+
+    if since_build is None:
+        # the previous parts are replaced, the new ones are still hidden temp files
+        new_parts = [builds_writer.tmp_path, samples_writer.tmp_path]
+        for partition in partitions:
+            for part in partition.glob("*") if partition.exists() else []:
+                if part in new_parts:
+                    continue
+                if part.is_dir():
+                    shutil.rmtree(part)
+                else:
+                    part.unlink()
+    builds_writer.commit()
+    samples_writer.commit()
+
+    print(
+        f"Exported {builds_writer.num_rows} builds and {samples_writer.num_rows} samples "
+        f"of {project_id}"
+    )
+
+    return last_build
+
+
+def write_project_parts(
+    url: str,
+    session: Session,
+    api_token: str,
+    project_id: str,
+    builds_writer: PartitionWriter,
+    samples_writer: PartitionWriter,
+    since_build: Optional[int] = None,
+    page_size: int = 100,
+    max_workers: int = 4,
+) -> Optional[int]:
+    """
+    Writes the builds and samples of a project newer than `since_build` to the (uncommitted) parts.
+    Returns the last exported build id.
+    """
+    last_build = since_build
+
+    builds = iter_pages(
+        lambda start, count: get_builds(
+            url=url,
+            session=session,
+            api_token=api_token,
+            project_id=project_id,
+            start=start,
+            count=count,
+        ),
+        page_size=page_size,
+    )
+    rows = []
+    for build in builds:
+        build_id = int(build["buildId"])
+        if since_build is not None and build_id <= since_build:
+            continue
+
+        infos = build.get("infos", {})
+        rows.append(
+            {
+                "build_id": build_id,
+                "build_url": infos.get("url", ""),
+                "build_hash": infos.get("hash", ""),
+                "build_subject": infos.get("subject", ""),
+                "build_abbrev_hash": infos.get("abbrevHash", ""),
+                "build_author_name": infos.get("authorName", ""),
+                "build_author_email": infos.get("authorEmail", ""),
+            }
+        )
+        last_build = build_id if last_build is None else max(last_build, build_id)
+
+        if len(rows) >= page_size:
+            builds_writer.write(rows)
+            rows = []
+    builds_writer.write(rows)
+    builds_writer.close()
+
+    for series_id, series in iter_series(
+        url=url,
+        session=session,
+        api_token=api_token,
+        project_id=project_id,
+        page_size=page_size,
+        max_workers=max_workers,
+    ):
+        if series is None:
+            continue
+
+        # one row group per series
+        samples_writer.write(
+            [
+                {"series_id": series_id, "build_id": int(build_id), "sample_value": float(value)}
+                for build_id, value in get_series_samples(series).items()
+                if since_build is None or int(build_id) > since_build
+            ]
+        )
+    samples_writer.close()
+
+    return last_build
+
+
+def load_export_state(output_dir: Path) -> Dict[str, int]:
+    state_path = Path(output_dir) / STATE_FILE
+    if not state_path.exists():
+        return {}
+
+    return json.load(open(state_path))
+
+
+def save_export_state(output_dir: Path, state: Dict[str, int]) -> None:
+    state_path = Path(output_dir) / STATE_FILE
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(state_path.with_name(f".{STATE_FILE}.tmp"), "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(state_path.with_name(f".{STATE_FILE}.tmp"), state_path)
+
+
+def main():
+    parser = ArgumentParser()
+
+    parser.add_argument("--url", type=str, required=True)
+    parser.add_argument("--project-id", type=str, nargs="+", required=True)
+    parser.add_argument("--output-dir", type=str, required=True)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--max-workers", type=int, default=4)
+    parser.add_argument("--full", action="store_true", default=False)
+    parser.add_argument("--session-cache", type=str, default=None)
+
+    args = parser.parse_args()
+
+    url = args.url
+    output_dir = Path(args.output_dir)
+
+    API_TOKEN = os.environ.get("API_TOKEN", None)
+    ADMIN_USERNAME = os.environ.get("ADMIN_USERNAME", "admin")
+    ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "admin")
+
+    configure()
+
+    session = login(
+        url=url,
+        api_token=API_TOKEN,
+        username=ADMIN_USERNAME,
+        password=ADMIN_PASSWORD,
+        cache_path=Path(args.session_cache) if args.session_cache else None,
+    )
+
+    state = load_export_state(output_dir)
+
+    for project_id in args.project_id:
+        last_build = export_project(
+            url=url,
+            session=session,
+            api_token=API_TOKEN,
+            project_id=project_id,
+            output_dir=output_dir,
+            since_build=None if args.full else state.get(project_id),
+            page_size=args.page_size,
+            max_workers=args.max_workers,
+        )
+
+        if last_build is not None:
+            state[project_id] = last_build
+            save_export_state(output_dir, state)
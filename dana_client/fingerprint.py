@@ -0,0 +1,152 @@
+import os
+import re
+import json
+import shutil
+import hashlib
+import platform
+import subprocess
+from pathlib import Path
+from importlib import metadata
+from urllib.parse import unquote, urlparse
+from typing import Any, Dict, List, Optional
+
+FINGERPRINT_FILE = "fingerprint.json"
+
+# packages whose versions change the benchmark results, the watched package is excluded from them
+# (see `get_fingerprint`) since its version changes with the benchmarked commits
+FINGERPRINT_PACKAGES = [
+    "torch",
+    "transformers",
+    "optimum",
+    "optimum-benchmark",
+    "accelerate",
+    "onnxruntime",
+    "onnxruntime-gpu",
+    "numpy",
+]
+
+
+def get_cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+
+    return platform.processor() or platform.machine()
+
+
+def get_memory_gb() -> Optional[int]:
+    try:
+        return round(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024**3)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def get_gpus() -> List[str]:
+    if shutil.which("nvidia-smi") is None:
+        return []
+
+    try:
+        out = subprocess.run(
+            ["nvidia-smi", "--query-gpu=name", "--format=csv,noheader"],
+            capture_output=True,
+            text=True,
+            timeout=30,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return []
+
+    return [gpu.strip() for gpu in out.stdout.splitlines() if gpu.strip()]
+
+
+def normalize_package_name(name: str) -> str:
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def get_editable_packages(path: Path) -> List[str]:
+    """
+    Returns the names of the distributions installed in editable mode from `path`.
+    """
+    path = Path(path).resolve()
+
+    names = []
+    for distribution in metadata.distributions():
+        try:
+            direct_url = json.loads(distribution.read_text("direct_url.json") or "{}")
+        except ValueError:
+            continue
+
+        url = urlparse(direct_url.get("url", ""))
+        if url.scheme == "file" and Path(unquote(url.path)).resolve() == path:
+            names.append(distribution.metadata["Name"])
+
+    return names
+
+
+def get_fingerprint(
+    packages: List[str] = FINGERPRINT_PACKAGES,
+    exclude: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Returns the hardware and software fingerprint of the runner: CPU model, core count, memory,
+    GPUs, OS, Python and the versions of the installed `packages`, except the `exclude` ones
+    (e.g. the watched package, see `get_editable_packages`).
+    """
+    excluded = {normalize_package_name(name) for name in exclude or []}
+
+    versions = {}
+    for package in packages:
+        if normalize_package_name(package) in excluded:
+            continue
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            continue
+
+    return {
+        "cpu_model": get_cpu_model(),
+        "cpu_count": os.cpu_count(),
+        "memory_gb": get_memory_gb(),
+        "gpus": get_gpus(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "python": platform.python_version(),
+        "packages": versions,
+    }
+
+
+def get_fingerprint_class(fingerprint: Dict[str, Any]) -> str:
+    """
+    Returns a short id of the fingerprint: runners with the same hardware and package versions
+    share the same class.
+    """
+    canonical = json.dumps(fingerprint, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(canonical).hexdigest()[:8]
+
+
+def save_fingerprint(folder: Path, fingerprint: Dict[str, Any]) -> None:
+    Path(folder).mkdir(parents=True, exist_ok=True)
+    with open(Path(folder) / FINGERPRINT_FILE, "w") as f:
+        json.dump(fingerprint, f, indent=2)
+
+
+def load_fingerprint(folder: Path) -> Optional[Dict[str, Any]]:
+    """
+    Returns the fingerprint recorded in a build folder, None for builds benchmarked without one.
+    """
+    fingerprint_path = Path(folder) / FINGERPRINT_FILE
+    if not fingerprint_path.exists():
+        return None
+
+    return json.load(open(fingerprint_path))
+
+
+def namespace_series(series: List[Dict[str, Any]], fingerprint_class: str) -> List[Dict[str, Any]]:
+    """
+    Suffixes the series ids with the fingerprint class, so that the samples of different runner
+    types go to different series.
+    """
+    return [{**s, "series_id": f"{s['series_id']}@{fingerprint_class}"} for s in series]
@@ -0,0 +1,310 @@
+import os
+import sys
+import time
+import random
+import threading
+from urllib.parse import urlparse
+from argparse import ArgumentParser
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .api import (
+    login,
+    configure,
+    add_build,
+    add_sample,
+    add_series,
+    add_project,
+    project_exists,
+    get_stats,
+    format_stats,
+)
+
+LOCAL_HOSTS = ["localhost", "127.0.0.1", "::1"]
+# bytes of a resolved optimum-benchmark hydra config, sent as the description of every series
+DESCRIPTION_SIZE = 4096
+PERCENTILES = [50, 95, 99]
+
+
+class LatencyRecorder:
+    """
+    Collects the latency and errors of the requests of every endpoint, from several threads.
+    """
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def call(self, endpoint: str, function: Callable[..., Any], **kwargs) -> Any:
+        start = time.perf_counter()
+        try:
+            return function(**kwargs)
+        except Exception:
+            with self.lock:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            raise
+        finally:
+            latency = time.perf_counter() - start
+            with self.lock:
+                self.latencies.setdefault(endpoint, []).append(latency)
+
+    def summary(self, duration: float) -> Dict[str, Dict[str, float]]:
+        """
+        Returns the number of requests, errors, throughput (requests/s over `duration`) and
+        latency percentiles (ms) of every endpoint.
+        """
+        with self.lock:
+            latencies = {endpoint: list(values) for endpoint, values in self.latencies.items()}
+            errors = dict(self.errors)
+
+        summary = {}
+        for endpoint, values in sorted(latencies.items()):
+            percentiles = np.percentile(np.asarray(values) * 1000, PERCENTILES)
+            summary[endpoint] = {
+                "requests": len(values),
+                "errors": errors.get(endpoint, 0),
+                "throughput": len(values) / duration if duration > 0 else 0.0,
+                **{f"p{p}": float(v) for p, v in zip(PERCENTILES, percentiles)},
+            }
+
+        return summary
+
+
+def format_load_summary(summary: Dict[str, Dict[str, float]]) -> str:
+    lines = [
+        f"{'endpoint':<20} {'requests':>9} {'errors':>7} {'req/s':>8} "
+        + " ".join(f"{f'p{p}(ms)':>9}" for p in PERCENTILES)
+    ]
+    for endpoint, stats in summary.items():
+        lines.append(
+            f"{endpoint:<20} {stats['requests']:>9} {stats['errors']:>7} "
+            f"{stats['throughput']:>8.1f} "
+            + " ".join(f"{stats[f'p{p}']:>9.1f}" for p in PERCENTILES)
+        )
+
+    return "\n".join(lines)
+
+
+def iter_builds(
+    num_projects: int,
+    num_builds: int,
+    project_prefix: str,
+    cycle: bool = False,
+) -> Iterator[Tuple[str, int]]:
+    """
+    Iterates over the (project_id, build_id) to publish, build by build across the projects
+    like concurrent CI pipelines would. With `cycle`, starts over with new build ids.
+    """
+    offset = 0
+    while True:
+        for build_id in range(offset + 1, offset + num_builds + 1):
+            for project in range(num_projects):
+                yield f"{project_prefix}-{project}", build_id
+        if not cycle:
+            return
+        offset += num_builds
+
+
+def make_series_description(size: int) -> str:
+    """
+    Returns a `size` bytes series description shaped like the hydra config `publish_build` sends.
+    """
+    lines = []
+    while sum(len(line) + len("<br>") for line in lines) < size:
+        lines.append(f"  option_{len(lines)}: value_{random.getrandbits(32):08x}")
+
+    return "<br>".join(lines)[:size]
+
+
+def publish_fake_build(
+    recorder: LatencyRecorder,
+    url: str,
+    session: Any,
+    api_token: str,
+    project_id: str,
+    build_id: int,
+    num_series: int,
+    description_size: int = DESCRIPTION_SIZE,
+) -> None:
+    """
+    Sends the requests that `build_utils.publish_build` sends for a build of `num_series` series,
+    each described by a `description_size` bytes config.
+    """
+    kwargs = dict(url=url, session=session, api_token=api_token, project_id=project_id)
+
+    if not recorder.call("/apis/getBuild", project_exists, **kwargs):
+        recorder.call(
+            "/admin/addProject",
+            add_project,
+            **kwargs,
+            users="",
+            project_description="",
+            override=True,
+        )
+
+    recorder.call(
+        "/apis/addBuild",
+        add_build,
+        **kwargs,
+        build_id=build_id,
+        build_hash=f"{random.getrandbits(160):040x}",
+        build_subject=f"Load test build {build_id}",
+        override=True,
+    )
+
+    series_description = make_series_description(description_size)
+    for series in range(num_series):
+        series_id = f"series_{series}_latency(ms)"
+        recorder.call(
+            "/apis/addSerie",
+            add_series,
+            **kwargs,
+            series_id=series_id,
+            series_unit="ms",
+            series_description=series_description,
+            benchmark_range="5%",
+            benchmark_required=3,
+            benchmark_trend="smaller",
+            override=True,
+        )
+        recorder.call(
+            "/apis/addSample",
+            add_sample,
+            **kwargs,
+            build_id=build_id,
+            series_id=series_id,
+            sample_value=random.gauss(100, 5),
+            sample_unit="ms",
+            override=True,
+        )
+
+
+def run_load(
+    url: str,
+    api_token: str,
+    username: str,
+    password: str,
+    num_projects: int = 10,
+    num_builds: int = 10,
+    num_series: int = 100,
+    description_size: int = DESCRIPTION_SIZE,
+    concurrency: int = 4,
+    ramp_up: float = 0.0,
+    duration: Optional[float] = None,
+    project_prefix: str = "loadgen",
+) -> Tuple[Dict[str, Dict[str, float]], float]:
+    """
+    Simulates `concurrency` CI pipelines publishing `num_projects` x `num_builds` builds of
+    `num_series` series described by `description_size` bytes configs. The pipelines are started
+    evenly over `ramp_up` seconds. With a `duration`, the pipelines keep publishing new builds
+    until it elapsed.
+    Returns the per endpoint summary (see `LatencyRecorder.summary`) and the wall time.
+    """
+    recorder = LatencyRecorder()
+    builds = iter_builds(
+        num_projects=num_projects,
+        num_builds=num_builds,
+        project_prefix=project_prefix,
+        cycle=duration is not None,
+    )
+    builds_lock = threading.Lock()
+    start = time.perf_counter()
+    deadline = start + duration if duration is not None else None
+
+    def pipeline(index: int) -> None:
+        time.sleep(ramp_up * index / concurrency)
+        try:
+            session = recorder.call(
+                "/login",
+                login,
+                url=url,
+                api_token=api_token,
+                username=username,
+                password=password,
+            )
+        except Exception as e:
+            print(f"Pipeline {index} failed to login: {e!r}")
+            return
+
+        while deadline is None or time.perf_counter() < deadline:
+            with builds_lock:
+                project_id, build_id = next(builds, (None, None))
+            if project_id is None:
+                return
+
+            try:
+                publish_fake_build(
+                    recorder=recorder,
+                    url=url,
+                    session=session,
+                    api_token=api_token,
+                    project_id=project_id,
+                    build_id=build_id,
+                    num_series=num_series,
+                    description_size=description_size,
+                )
+            except Exception as e:
+                # recorded, the pipeline moves on to the next build
+                print(f"Build {build_id} of {project_id} failed: {e!r}")
+
+    threads = [threading.Thread(target=pipeline, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    wall_time = time.perf_counter() - start
+
+    return recorder.summary(wall_time), wall_time
+
+
+def main():
+    parser = ArgumentParser()
+
+    parser.add_argument("--url", type=str, default="http://localhost:7000")
+    parser.add_argument("--num-projects", type=int, default=10)
+    parser.add_argument("--num-builds", type=int, default=10)
+    parser.add_argument("--num-series", type=int, default=100)
+    parser.add_argument("--description-size", type=int, default=DESCRIPTION_SIZE)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--ramp-up", type=float, default=0.0)
+    parser.add_argument("--duration", type=float, default=None)
+    parser.add_argument("--project-prefix", type=str, default="loadgen")
+    parser.add_argument("--compress", action="store_true", default=False)
+    parser.add_argument("--serializer", type=str, default="auto")
+    parser.add_argument("--allow-remote", action="store_true", default=False)
+
+    args = parser.parse_args()
+
+    if urlparse(args.url).hostname not in LOCAL_HOSTS and not args.allow_remote:
+        parser.error(f"{args.url} is not a local server, pass --allow-remote to load test it")
+
+    API_TOKEN = os.environ.get("API_TOKEN", None)
+    ADMIN_USERNAME = os.environ.get("ADMIN_USERNAME", "admin")
+    ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "admin")
+
+    configure(serializer=args.serializer, compress=args.compress)
+
+    summary, wall_time = run_load(
+        url=args.url,
+        api_token=API_TOKEN,
+        username=ADMIN_USERNAME,
+        password=ADMIN_PASSWORD,
+        num_projects=args.num_projects,
+        num_builds=args.num_builds,
+        num_series=args.num_series,
+        description_size=args.description_size,
+        concurrency=args.concurrency,
+        ramp_up=args.ramp_up,
+        duration=args.duration,
+        project_prefix=args.project_prefix,
+    )
+
+    print(f"Ran {args.concurrency} pipelines for {wall_time:.1f}s")
+    print(format_load_summary(summary))
+    print(format_stats(get_stats()))
+
+    if any(stats["errors"] for stats in summary.values()):
+        sys.exit(1)
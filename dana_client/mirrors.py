@@ -0,0 +1,163 @@
+import os
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .api import login
+from .concurrency import AdaptiveLimiter
+
+# builds published to and failed on every target server, by url
+_REPORTS: Dict[str, Dict[str, Any]] = {}
+_REPORTS_LOCK = threading.Lock()
+
+
+def parse_mirror(spec: str) -> Tuple[str, Optional[str]]:
+    """
+    Parses a mirror spec `URL` or `URL=PREFIX`, where the mirror's credentials are read from the
+    `<PREFIX>_API_TOKEN`, `<PREFIX>_ADMIN_USERNAME` and `<PREFIX>_ADMIN_PASSWORD` env variables.
+    """
+    url, _, prefix = spec.partition("=")
+    return url, prefix or None
+
+
+def login_mirrors(
+    specs: Optional[List[str]],
+    api_token: str,
+    username: str,
+    password: str,
+    cache_path: Optional[Path] = None,
+    max_workers: int = 1,
+    rate_limits: Optional[Dict[str, float]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Logs in to the mirror servers, each with its own session, token and concurrency limiter.
+    Credentials without a prefixed env variable default to the given ones.
+    A mirror that fails to log in is recorded in the targets report and left out of the run.
+    """
+    mirrors = []
+    for i, spec in enumerate(specs or []):
+        url, prefix = parse_mirror(spec)
+        mirror_api_token, mirror_username, mirror_password = api_token, username, password
+        if prefix is not None:
+            mirror_api_token = os.environ.get(f"{prefix}_API_TOKEN", api_token)
+            mirror_username = os.environ.get(f"{prefix}_ADMIN_USERNAME", username)
+            mirror_password = os.environ.get(f"{prefix}_ADMIN_PASSWORD", password)
+
+        try:
+            session = login(
+                url=url,
+                api_token=mirror_api_token,
+                username=mirror_username,
+                password=mirror_password,
+                # a cache file holds a single session
+                cache_path=(
+                    cache_path.with_name(f"{cache_path.name}.mirror{i}") if cache_path else None
+                ),
+            )
+        except Exception as e:
+            record_target_failure(url=url, label="login", error=e)
+            continue
+        if max_workers > 1 or rate_limits:
+            session.dana_limiter = AdaptiveLimiter(max_limit=max_workers, rate_limits=rate_limits)
+
+        mirrors.append({"url": url, "session": session, "api_token": mirror_api_token})
+
+    return mirrors
+
+
+def record_target_failure(url: str, label: str, error: Exception) -> None:
+    """
+    Records the failure of a target in the targets report (see `get_targets_report`).
+    """
+    with _REPORTS_LOCK:
+        report = _REPORTS.setdefault(url, {"published": 0, "failed": []})
+        report["failed"].append(f"{label}: {error!r}")
+
+    print(f"{label} failed on {url}, dropping it: {error!r}")
+
+
+def setup_mirrors(
+    mirrors: Optional[List[Dict[str, Any]]],
+    setup: Callable[[Dict[str, Any]], None],
+    label: str,
+) -> List[Dict[str, Any]]:
+    """
+    Calls `setup(mirror)` for every mirror. A mirror that fails is recorded in the targets report
+    and left out of the returned mirrors, so that it doesn't stop the run on the other servers.
+    """
+    ready = []
+    for mirror in mirrors or []:
+        try:
+            setup(mirror)
+        except Exception as e:
+            record_target_failure(url=mirror["url"], label=label, error=e)
+            continue
+        ready.append(mirror)
+
+    return ready
+
+
+def publish_to_targets(
+    targets: List[Dict[str, Any]],
+    publish: Callable[[Dict[str, Any]], None],
+    label: str,
+) -> Dict[str, Optional[str]]:
+    """
+    Calls `publish(target)` for all the targets concurrently. A target that fails doesn't stop
+    the others: its error is recorded in the targets report (see `get_targets_report`).
+    Raises if all the targets failed. Returns the error of every target url (None if it succeeded).
+    """
+
+    def publish_target(target: Dict[str, Any]) -> Optional[Exception]:
+        try:
+            publish(target)
+        except Exception as e:
+            if len(targets) == 1:
+                raise
+            return e
+        return None
+
+    if len(targets) == 1:
+        errors = [publish_target(targets[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+            errors = list(executor.map(publish_target, targets))
+
+    with _REPORTS_LOCK:
+        for target, error in zip(targets, errors):
+            report = _REPORTS.setdefault(target["url"], {"published": 0, "failed": []})
+            if error is None:
+                report["published"] += 1
+            else:
+                report["failed"].append(f"{label}: {error!r}")
+
+    if len(targets) > 1:
+        for target, error in zip(targets, errors):
+            status = "ok" if error is None else f"failed ({error!r})"
+            print(f"Published {label} to {target['url']}: {status}")
+
+    if all(error is not None for error in errors):
+        raise RuntimeError(f"Publishing {label} failed on all targets") from errors[-1]
+
+    return {
+        target["url"]: None if error is None else repr(error)
+        for target, error in zip(targets, errors)
+    }
+
+
+def get_targets_report() -> Dict[str, Dict[str, Any]]:
+    with _REPORTS_LOCK:
+        return {url: dict(report) for url, report in _REPORTS.items()}
+
+
+def format_targets_report(report: Dict[str, Dict[str, Any]]) -> str:
+    lines = []
+    for url, target_report in report.items():
+        lines.append(
+            f"{url}: {target_report['published']} published, "
+            f"{len(target_report['failed'])} failed"
+        )
+        lines += [f"  {failure}" for failure in target_report["failed"]]
+
+    return "\n".join(lines)
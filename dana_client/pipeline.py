@@ -0,0 +1,85 @@
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class BackgroundPublisher:
+    """
+    Runs publishing tasks in a background thread, one at a time and in submission order, while
+    the caller benchmarks the next builds. At most `max_pending` tasks wait for the running one,
+    `submit` blocks beyond that, so that the staged builds don't pile up on disk.
+    A failing task is raised by the next `submit` (after queuing its task) or `join`. The tasks
+    submitted before the failure was raised are skipped (their staged builds are kept) and the
+    following ones run again. The failed and skipped keys are returned by `pop_dropped`.
+    """
+
+    def __init__(self, max_pending: int = 1):
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.results: Dict[str, Any] = {}
+        self.skipped: List[str] = []
+        self.failed: List[str] = []
+        self.error: Optional[BaseException] = None
+        self.failed_key: Optional[str] = None
+        # tasks of an older generation were submitted before the last failure was raised
+        self.generation = 0
+        self.lock = threading.Lock()
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+
+            key, task, generation = item
+            with self.lock:
+                skip = generation != self.generation
+                if skip:
+                    self.skipped.append(key)
+            if skip:
+                continue
+
+            try:
+                self.results[key] = task()
+            except Exception as e:
+                with self.lock:
+                    self.error = e
+                    self.failed_key = key
+                    self.failed.append(key)
+                    self.generation += 1
+
+    def _raise_error(self) -> None:
+        with self.lock:
+            error, key = self.error, self.failed_key
+            self.error = None
+        if error is not None:
+            raise RuntimeError(f"Publishing build {key} failed") from error
+
+    def submit(self, key: str, task: Callable[[], Any]) -> None:
+        # a task submitted after a failure runs, the failure is raised once it's queued
+        with self.lock:
+            generation = self.generation
+        self.queue.put((key, task, generation))
+        self._raise_error()
+
+    def pop_dropped(self) -> Tuple[List[str], List[str]]:
+        """
+        Returns and forgets the keys of the tasks that failed and of those that were skipped.
+        """
+        with self.lock:
+            failed, skipped = self.failed, self.skipped
+            self.failed, self.skipped = [], []
+
+        return failed, skipped
+
+    def join(self) -> Dict[str, Any]:
+        """
+        Waits for all the submitted tasks and returns their results by key.
+        """
+        self.queue.put(None)
+        self.thread.join()
+        self._raise_error()
+
+        return self.results
@@ -0,0 +1,188 @@
+import os
+import sys
+import shutil
+import pstats
+import hashlib
+from pathlib import Path
+from html import escape
+from typing import Dict, List, Optional, Tuple
+
+PROFILERS = ["py-spy", "cprofile"]
+
+# artifacts written to every benchmark folder of a profiled config
+PROFILE_COLLAPSED = "profile.collapsed"
+PROFILE_FLAMEGRAPH = "profile.svg"
+PROFILE_DIFF_COLLAPSED = "profile_diff.collapsed"
+PROFILE_DIFF_FLAMEGRAPH = "profile_diff.svg"
+
+FRAME_HEIGHT = 16
+FLAMEGRAPH_WIDTH = 1200
+
+
+def get_profiler_command(command: List[str], profiler: str, output_path: Path) -> List[str]:
+    """
+    Wraps a command to run it under a profiler: py-spy (sampling, follows the subprocesses)
+    or cProfile (deterministic, main process only).
+    """
+    if profiler == "py-spy":
+        return [
+            "py-spy",
+            "record",
+            "--format",
+            "raw",
+            "--subprocesses",
+            "--output",
+            str(output_path),
+            "--",
+        ] + command
+    if profiler == "cprofile":
+        executable = shutil.which(command[0]) or command[0]
+        return [sys.executable, "-m", "cProfile", "-o", str(output_path), executable] + command[1:]
+
+    raise ValueError(f"Unknown profiler {profiler}, available: {PROFILERS}")
+
+
+def read_collapsed(path: Path) -> Dict[str, int]:
+    """
+    Reads collapsed stacks, one `frame;frame;frame count` line per stack.
+    """
+    stacks = {}
+    with open(path) as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if stack and count.isdigit():
+                stacks[stack] = stacks.get(stack, 0) + int(count)
+
+    return stacks
+
+
+def write_collapsed(path: Path, stacks: Dict[str, int]) -> None:
+    with open(path, "w") as f:
+        for stack, count in sorted(stacks.items()):
+            f.write(f"{stack} {count}\n")
+
+
+def cprofile_to_collapsed(profile_path: Path) -> Dict[str, int]:
+    """
+    Converts a cProfile output to collapsed stacks in microseconds. cProfile only records
+    caller/callee pairs, so the self time of a function is attributed to its heaviest call path.
+    """
+    stats = pstats.Stats(str(profile_path)).stats
+
+    def frame_name(func: Tuple[str, int, str]) -> str:
+        filename, line, name = func
+        return f"{name} ({os.path.basename(filename)}:{line})"
+
+    stacks = {}
+    for func, (_, _, self_time, _, _) in stats.items():
+        if self_time <= 0:
+            continue
+
+        path = [func]
+        while True:
+            callers = stats[path[-1]][4]
+            candidates = [c for c in callers if c in stats and c not in path]
+            if not candidates:
+                break
+            path.append(max(candidates, key=lambda c: callers[c][3]))
+
+        stack = ";".join(frame_name(f) for f in reversed(path))
+        stacks[stack] = stacks.get(stack, 0) + int(self_time * 1e6)
+
+    return stacks
+
+
+def diff_collapsed(before: Dict[str, int], after: Dict[str, int]) -> Dict[str, Tuple[int, int]]:
+    """
+    Pairs the counts of every stack before and after, scaling `before` to the total of `after`
+    so that the profiles of runs of different durations compare.
+    """
+    scale = sum(after.values()) / max(sum(before.values()), 1)
+
+    return {
+        stack: (round(before.get(stack, 0) * scale), after.get(stack, 0))
+        for stack in sorted(set(before) | set(after))
+    }
+
+
+def write_diff_collapsed(path: Path, diff: Dict[str, Tuple[int, int]]) -> None:
+    """
+    Writes a differential profile, one `frame;frame;frame before after` line per stack.
+    """
+    with open(path, "w") as f:
+        for stack, (before, after) in diff.items():
+            f.write(f"{stack} {before} {after}\n")
+
+
+def _frame_totals(stacks: Dict[str, int]) -> Dict[Tuple[str, ...], int]:
+    # inclusive count of every call path prefix
+    totals = {}
+    for stack, count in stacks.items():
+        frames = tuple(stack.split(";"))
+        for depth in range(1, len(frames) + 1):
+            totals[frames[:depth]] = totals.get(frames[:depth], 0) + count
+
+    return totals
+
+
+def _frame_color(name: str, delta: Optional[float]) -> str:
+    if delta is None:
+        # warm colors, stable per function
+        seed = int(hashlib.md5(name.encode("utf-8")).hexdigest()[:4], 16)
+        return f"rgb(230,{100 + seed % 130},{seed % 60})"
+
+    # red for frames that grew, blue for frames that shrunk
+    intensity = int(255 * (1 - min(abs(delta) * 5, 1)))
+    return f"rgb(255,{intensity},{intensity})" if delta > 0 else f"rgb({intensity},{intensity},255)"
+
+
+def render_flamegraph(
+    stacks: Dict[str, int],
+    title: str = "",
+    before: Optional[Dict[str, int]] = None,
+) -> str:
+    """
+    Renders collapsed stacks as an SVG flamegraph. With `before`, frames are colored by how much
+    their share of the profile grew (red) or shrunk (blue) since `before`.
+    """
+    totals = _frame_totals(stacks)
+    before_totals = _frame_totals(before) if before is not None else None
+    total = sum(stacks.values()) or 1
+    before_total = (sum(before.values()) or 1) if before is not None else 1
+
+    depth = max((len(frames) for frames in totals), default=0)
+    height = (depth + 2) * FRAME_HEIGHT
+    x_scale = FLAMEGRAPH_WIDTH / total
+
+    rects = []
+    # children are laid out left to right in name order, under their parent
+    offsets = {(): 0}
+    for frames in sorted(totals):
+        x = offsets[frames[:-1]]
+        offsets[frames[:-1]] = x + totals[frames]
+        offsets[frames] = x
+
+        width = totals[frames] * x_scale
+        if width < 0.5:
+            continue
+
+        delta = None
+        if before_totals is not None:
+            delta = totals[frames] / total - before_totals.get(frames, 0) / before_total
+
+        name = escape(frames[-1])
+        y = height - (len(frames) + 1) * FRAME_HEIGHT
+        label = escape(frames[-1][: int(width / 7)]) if width > 21 else ""
+        rects.append(
+            f"<g><title>{name} ({100 * totals[frames] / total:.2f}%)</title>"
+            f'<rect x="{x * x_scale:.1f}" y="{y}" width="{width:.1f}" height="{FRAME_HEIGHT - 1}" '
+            f'fill="{_frame_color(frames[-1], delta)}"/>'
+            f'<text x="{x * x_scale + 3:.1f}" y="{y + FRAME_HEIGHT - 4}">{label}</text></g>'
+        )
+
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{FLAMEGRAPH_WIDTH}" height="{height}" '
+        f'font-family="monospace" font-size="11">'
+        f'<text x="{FLAMEGRAPH_WIDTH / 2}" y="{FRAME_HEIGHT - 4}" text-anchor="middle">'
+        f"{escape(title)}</text>" + "".join(rects) + "</svg>"
+    )
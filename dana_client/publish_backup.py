@@ -1,66 +1,340 @@
 import os
+import sys
 import json
+import time
+import hashlib
+import queue
+import multiprocessing
 from pathlib import Path
 from requests import Session
-from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from argparse import ArgumentParser, Namespace
 
-from .api import login
+from .api import login, configure, get_stats, format_stats, add_project, project_exists
 from .build_utils import publish_build
+from .concurrency import AdaptiveLimiter, format_limiter_summary, parse_rate_limits
+from .mirrors import (
+    format_targets_report,
+    get_targets_report,
+    login_mirrors,
+    parse_mirror,
+    setup_mirrors,
+)
 
-from huggingface_hub import snapshot_download, logging
-from huggingface_hub.utils import disable_progress_bars
+from huggingface_hub import HfApi, snapshot_download, logging
+from huggingface_hub.hf_api import RepoFile
+from huggingface_hub.utils import RevisionNotFoundError, disable_progress_bars
 
 disable_progress_bars()
 logging.set_verbosity_warning()
 
+# seconds a shard waits for the shard owning a project to create it
+PROJECT_WAIT_TIMEOUT = 600
+PROJECT_WAIT_INTERVAL = 5
 
-def publish_backup(
-    url: str,
-    session: Session,
+
+def get_shard(key: str, num_shards: int) -> int:
+    """
+    Returns the shard of a key, stable across processes and machines (unlike `hash`).
+    """
+    return int(hashlib.sha256(key.encode("utf-8")).hexdigest(), 16) % num_shards
+
+
+def get_project_owner(project_id: str, num_machine_shards: int) -> int:
+    """
+    Returns the shard that creates a project: the first process of its machine shard. The
+    sub-shard `j * N + i` is the process `j` of the machine shard `i` (see `publish_processes`),
+    so the owner doesn't depend on the number of processes of each machine.
+    """
+    return get_shard(project_id, num_machine_shards)
+
+
+def get_build_key(path: str) -> Optional[Tuple[str, str]]:
+    """
+    Returns the (project_id, build_id) of a dataset file, None if it isn't in a build folder.
+    """
+    parts = path.split("/")
+    if len(parts) > 2 and parts[1].isdigit():
+        return parts[0], parts[1]
+
+    return None
+
+
+def get_dataset_revision(dataset_id: str, hf_token: str) -> str:
+    """
+    Returns the commit hash of the head of the dataset.
+    """
+    return HfApi().dataset_info(repo_id=dataset_id, token=hf_token).sha
+
+
+def list_backup_builds(
+    dataset_id: str,
     hf_token: str,
-    api_token: str,
+    revision: Optional[str] = None,
+) -> List[Tuple[str, str]]:
+    """
+    Lists the (project_id, build_id) folders of a backup dataset without downloading it.
+    """
+    files = HfApi().list_repo_files(
+        repo_id=dataset_id,
+        revision=revision,
+        repo_type="dataset",
+        token=hf_token,
+    )
+
+    return sorted({get_build_key(file) for file in files} - {None})
+
+
+def list_changed_builds(
     dataset_id: str,
-):
+    hf_token: str,
+    since_revision: str,
+    revision: str,
+) -> List[Tuple[str, str]]:
     """
-    Publishes a backup dataset to DANA server.
+    Lists the build folders with files added or modified between two revisions of a backup
+    dataset, comparing the blob ids of their files. Builds whose folder was deleted are not listed.
     """
 
-    dataset_path = Path(
-        snapshot_download(
+    def get_blobs(revision: str) -> Dict[str, str]:
+        tree = HfApi().list_repo_tree(
             repo_id=dataset_id,
+            recursive=True,
+            revision=revision,
             repo_type="dataset",
             token=hf_token,
         )
-    )
-    for project_path in dataset_path.iterdir():
-        if not project_path.is_dir():
+        return {entry.path: entry.blob_id for entry in tree if isinstance(entry, RepoFile)}
+
+    before = get_blobs(since_revision)
+    after = get_blobs(revision)
+    changed = [path for path, blob_id in after.items() if before.get(path) != blob_id]
+
+    return sorted({get_build_key(path) for path in changed} - {None})
+
+
+def load_sync_state(state_path: Path) -> Dict[str, str]:
+    if not Path(state_path).exists():
+        return {}
+
+    return json.load(open(state_path))
+
+
+def save_sync_state(state_path: Path, state: Dict[str, str]) -> None:
+    state_path = Path(state_path)
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_path = state_path.with_name(f".{state_path.name}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_path)
+
+
+def get_since_revision(state: Dict[str, str], dataset_id: str, urls: List[str]) -> Optional[str]:
+    """
+    Returns the revision recorded for all the target `urls`, or None (a full publish) if a target
+    has no recorded revision or they differ, e.g. after a run where a mirror failed.
+    """
+    revisions = {state.get(f"{dataset_id} {url}") for url in urls}
+    return revisions.pop() if len(revisions) == 1 else None
+
+
+def update_sync_state(
+    state: Dict[str, str],
+    dataset_id: str,
+    urls: List[str],
+    revision: str,
+    failed_urls: List[str],
+) -> None:
+    """
+    Records `revision` for the target `urls`, except the failed ones which keep their older revision
+    so that their missing builds are published again on the next run.
+    """
+    for url in urls:
+        if url not in failed_urls:
+            state[f"{dataset_id} {url}"] = revision
+
+
+def prepare_projects(
+    target: Dict[str, Any],
+    project_ids: List[str],
+    shard_index: int,
+    num_shards: int,
+    num_machine_shards: Optional[int] = None,
+    timeout: float = PROJECT_WAIT_TIMEOUT,
+) -> None:
+    """
+    Creates the projects owned by this shard on a target server and waits for the others to be
+    created by their owner shard, so that shards don't race on the project setup.
+    When the `num_machine_shards` shards are split by processes, see `get_project_owner`.
+    """
+    kwargs = dict(url=target["url"], session=target["session"], api_token=target["api_token"])
+
+    for project_id in project_ids:
+        if get_project_owner(project_id, num_machine_shards or num_shards) == shard_index:
+            if not project_exists(**kwargs, project_id=project_id):
+                add_project(
+                    **kwargs,
+                    project_id=project_id,
+                    users="",
+                    project_description="",
+                    override=True,
+                )
             continue
-        for build_path in project_path.iterdir():
-            if not build_path.is_dir():
+
+        deadline = time.time() + timeout
+        while not project_exists(**kwargs, project_id=project_id):
+            if time.time() > deadline:
+                raise TimeoutError(f"Project {project_id} wasn't created on {target['url']}")
+            time.sleep(PROJECT_WAIT_INTERVAL)
+
+
+def publish_backup(
+    url: str,
+    session: Session,
+    hf_token: str,
+    api_token: str,
+    dataset_id: str,
+    store_path: Optional[Path] = None,
+    sync: bool = False,
+    dry_run: bool = False,
+    max_workers: int = 1,
+    mirrors: Optional[List[Dict[str, Any]]] = None,
+    shard_index: int = 0,
+    num_shards: int = 1,
+    num_machine_shards: Optional[int] = None,
+    fingerprint_series: bool = False,
+    revision: Optional[str] = None,
+    since_revision: Optional[str] = None,
+) -> str:
+    """
+    Publishes a backup dataset to DANA server, `max_workers` builds at a time.
+    Every build is parsed once and published to the server and its `mirrors`.
+    With `num_shards`, only the builds of the `shard_index` shard are downloaded and published,
+    so that the dataset can be published by several processes or machines (`num_machine_shards`
+    is the number of machine shards when they are split by processes, see `prepare_projects`).
+    With `since_revision`, only the builds changed since that revision of the dataset are.
+    Returns the published `revision` (the head of the dataset if None).
+    """
+    if revision is None:
+        revision = get_dataset_revision(dataset_id=dataset_id, hf_token=hf_token)
+
+    if since_revision == revision:
+        print(f"Dataset {dataset_id} unchanged since revision {revision}")
+        return revision
+
+    if num_shards == 1 and since_revision is None:
+        dataset_path = Path(
+            snapshot_download(
+                repo_id=dataset_id,
+                revision=revision,
+                repo_type="dataset",
+                token=hf_token,
+            )
+        )
+        builds = []
+        for project_path in dataset_path.iterdir():
+            if not project_path.is_dir():
                 continue
+            for build_path in project_path.iterdir():
+                if not build_path.is_dir():
+                    continue
+                builds.append(build_path)
+    else:
+        all_builds = None
+        if since_revision is not None:
+            try:
+                all_builds = list_changed_builds(
+                    dataset_id=dataset_id,
+                    hf_token=hf_token,
+                    since_revision=since_revision,
+                    revision=revision,
+                )
+                print(f"{len(all_builds)} builds changed since revision {since_revision}")
+            except RevisionNotFoundError:
+                # e.g. the history of the dataset was squashed
+                print(f"Revision {since_revision} not found, publishing all the builds")
+        if all_builds is None:
+            all_builds = list_backup_builds(
+                dataset_id=dataset_id,
+                hf_token=hf_token,
+                revision=revision,
+            )
+
+        shard_builds = [
+            (project_id, build_id)
+            for project_id, build_id in all_builds
+            if get_shard(f"{project_id}/{build_id}", num_shards) == shard_index
+        ]
+        if num_shards > 1:
+            print(
+                f"Shard {shard_index}/{num_shards}: {len(shard_builds)} of {len(all_builds)} builds"
+            )
+
+        if num_shards > 1 and not dry_run:
+
+            def prepare(target: Dict[str, Any]) -> None:
+                prepare_projects(
+                    target=target,
+                    project_ids=sorted({project_id for project_id, _ in all_builds}),
+                    shard_index=shard_index,
+                    num_shards=num_shards,
+                    num_machine_shards=num_machine_shards,
+                )
+
+            prepare({"url": url, "session": session, "api_token": api_token})
+            mirrors = setup_mirrors(mirrors=mirrors, setup=prepare, label="projects setup")
 
-            project_id = project_path.name
-            build_id = int(build_path.name)
-
-            build_info = json.load(open(build_path / "build_info.json"))
-
-            # publish the build
-            publish_build(
-                folder=build_path,
-                url=url,
-                session=session,
-                api_token=api_token,
-                project_id=project_id,
-                build_id=build_id,
-                build_url=build_info["build_url"],
-                build_hash=build_info["build_hash"],
-                build_subject=build_info["build_subject"],
-                build_abbrev_hash=build_info["build_abbrev_hash"],
-                build_author_name=build_info["build_author_name"],
-                build_author_email=build_info["build_author_email"],
-                average_range="5%",
-                average_min_count=3,
+        if not shard_builds:
+            return revision
+
+        # the files of unchanged builds, and the unchanged files of a build, are in the cache
+        dataset_path = Path(
+            snapshot_download(
+                repo_id=dataset_id,
+                revision=revision,
+                repo_type="dataset",
+                token=hf_token,
+                allow_patterns=[f"{p}/{b}/*" for p, b in shard_builds],
             )
+        )
+        builds = [dataset_path / project_id / build_id for project_id, build_id in shard_builds]
+
+    def publish(build_path: Path) -> None:
+        project_id = build_path.parent.name
+        build_id = int(build_path.name)
+
+        build_info = json.load(open(build_path / "build_info.json"))
+
+        # publish the build
+        publish_build(
+            folder=build_path,
+            url=url,
+            session=session,
+            api_token=api_token,
+            project_id=project_id,
+            build_id=build_id,
+            build_url=build_info["build_url"],
+            build_hash=build_info["build_hash"],
+            build_subject=build_info["build_subject"],
+            build_abbrev_hash=build_info["build_abbrev_hash"],
+            build_author_name=build_info["build_author_name"],
+            build_author_email=build_info["build_author_email"],
+            average_range="5%",
+            average_min_count=3,
+            store_path=store_path,
+            sync=sync,
+            dry_run=dry_run,
+            max_workers=max_workers,
+            mirrors=mirrors,
+            fingerprint_series=fingerprint_series,
+        )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(publish, builds))
+
+    return revision
 
 
 def main():
@@ -68,22 +342,149 @@ def main():
 
     parser.add_argument("--url", type=str, required=True)
     parser.add_argument("--dataset-id", type=str, required=True)
+    parser.add_argument("--store", type=str, default=None)
+    parser.add_argument("--compress", action="store_true", default=False)
+    parser.add_argument("--session-cache", type=str, default=None)
+    parser.add_argument("--serializer", type=str, default="auto")
+    parser.add_argument("--max-concurrency", type=int, default=1)
+    parser.add_argument("--rate-limit", type=str, action="append", default=None)
+    parser.add_argument("--sync", action="store_true", default=False)
+    parser.add_argument("--dry-run", action="store_true", default=False)
+    parser.add_argument("--mirror", type=str, action="append", default=None)
+    parser.add_argument("--shard-index", type=int, default=0)
+    parser.add_argument("--num-shards", type=int, default=1)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--fingerprint-series", action="store_true", default=False)
+    parser.add_argument("--revision", type=str, default=None)
+    parser.add_argument("--revision-state", type=str, default=None)
 
     args = parser.parse_args()
 
+    if not 0 <= args.shard_index < args.num_shards:
+        parser.error("--shard-index must be in [0, --num-shards)")
+
+    # all the processes publish the same revision, which is only recorded once they all succeeded
+    revision = args.revision or get_dataset_revision(
+        dataset_id=args.dataset_id,
+        hf_token=os.environ.get("HF_TOKEN", None),
+    )
+    urls = [args.url] + [parse_mirror(spec)[0] for spec in args.mirror or []]
+    state = load_sync_state(args.revision_state) if args.revision_state else {}
+    since_revision = get_since_revision(state=state, dataset_id=args.dataset_id, urls=urls)
+
+    if args.processes == 1:
+        failed_urls = publish_shard(
+            args=args,
+            shard_index=args.shard_index,
+            num_shards=args.num_shards,
+            revision=revision,
+            since_revision=since_revision,
+        )
+    else:
+        failed_urls = publish_processes(args=args, revision=revision, since_revision=since_revision)
+
+    if args.revision_state and not args.dry_run:
+        update_sync_state(
+            state=state,
+            dataset_id=args.dataset_id,
+            urls=urls,
+            revision=revision,
+            failed_urls=failed_urls,
+        )
+        save_sync_state(args.revision_state, state)
+
+
+def publish_shard_process(failed_urls: multiprocessing.Queue, **kwargs) -> None:
+    failed_urls.put(publish_shard(**kwargs))
+
+
+def publish_processes(args: Namespace, revision: str, since_revision: Optional[str]) -> List[str]:
+    """
+    Publishes the shard with `args.processes` local processes.
+    Returns the target urls that failed in any of the processes.
+    """
+    failed_urls = multiprocessing.Queue()
+    # every process publishes a sub-shard of this shard: the keys of the shard `i` of `N`
+    # are the keys of the shards `j * N + i` of `N * processes`
+    processes = [
+        multiprocessing.Process(
+            target=publish_shard_process,
+            kwargs=dict(
+                failed_urls=failed_urls,
+                args=args,
+                shard_index=j * args.num_shards + args.shard_index,
+                num_shards=args.num_shards * args.processes,
+                revision=revision,
+                since_revision=since_revision,
+            ),
+        )
+        for j in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    # drained before joining, a process doesn't exit until its queued result is read
+    failed = set()
+    for process in processes:
+        while process.is_alive() or not failed_urls.empty():
+            try:
+                failed.update(failed_urls.get(timeout=1))
+            except queue.Empty:
+                pass
+    for process in processes:
+        process.join()
+
+    if any(process.exitcode != 0 for process in processes):
+        sys.exit(1)
+
+    return sorted(failed)
+
+
+def publish_shard(
+    args: Namespace,
+    shard_index: int,
+    num_shards: int,
+    revision: Optional[str] = None,
+    since_revision: Optional[str] = None,
+) -> List[str]:
+    """
+    Publishes a shard of the backup. Returns the target urls that failed for some builds.
+    """
     url = args.url
     dataset_id = args.dataset_id
+    store_path = Path(args.store) if args.store else None
+    sync = args.sync
+    dry_run = args.dry_run
 
     HF_TOKEN = os.environ.get("HF_TOKEN", None)
     API_TOKEN = os.environ.get("API_TOKEN", None)
     ADMIN_USERNAME = os.environ.get("ADMIN_USERNAME", "admin")
     ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "admin")
 
+    configure(serializer=args.serializer, compress=args.compress)
+
     session = login(
         url=url,
         api_token=API_TOKEN,
         username=ADMIN_USERNAME,
         password=ADMIN_PASSWORD,
+        cache_path=Path(args.session_cache) if args.session_cache else None,
+    )
+
+    max_workers = args.max_concurrency
+    if max_workers > 1 or args.rate_limit:
+        session.dana_limiter = AdaptiveLimiter(
+            max_limit=max_workers,
+            rate_limits=parse_rate_limits(args.rate_limit),
+        )
+
+    mirrors = login_mirrors(
+        specs=args.mirror,
+        api_token=API_TOKEN,
+        username=ADMIN_USERNAME,
+        password=ADMIN_PASSWORD,
+        cache_path=Path(args.session_cache) if args.session_cache else None,
+        max_workers=max_workers,
+        rate_limits=parse_rate_limits(args.rate_limit),
     )
 
     publish_backup(
@@ -92,4 +493,24 @@ def main():
         hf_token=HF_TOKEN,
         api_token=API_TOKEN,
         dataset_id=dataset_id,
+        store_path=store_path,
+        sync=sync,
+        dry_run=dry_run,
+        max_workers=max_workers,
+        mirrors=mirrors,
+        shard_index=shard_index,
+        num_shards=num_shards,
+        num_machine_shards=args.num_shards,
+        fingerprint_series=args.fingerprint_series,
+        revision=revision,
+        since_revision=since_revision,
     )
+
+    print(format_stats(get_stats()))
+    if getattr(session, "dana_limiter", None) is not None:
+        print(format_limiter_summary(session.dana_limiter.summary()))
+    report = get_targets_report()
+    if mirrors:
+        print(format_targets_report(report))
+
+    return [target_url for target_url, target_report in report.items() if target_report["failed"]]
@@ -0,0 +1,223 @@
+import sqlite3
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .store import get_project_history
+
+REGRESSION = "regression"
+IMPROVEMENT = "improvement"
+STABLE = "stable"
+INSUFFICIENT = "insufficient"
+
+ANALYSIS_WINDOW = 100
+
+
+def parse_range(benchmark_range: str) -> Tuple[float, bool]:
+    """
+    Parses a Dana benchmark range ("5%" or "0.5") into a (tolerance, is_relative) tuple.
+    """
+    benchmark_range = str(benchmark_range).strip()
+    if benchmark_range.endswith("%"):
+        return float(benchmark_range[:-1]) / 100, True
+
+    return float(benchmark_range), False
+
+
+def detect_regressions(
+    history: pd.DataFrame,
+    build_id: int,
+    benchmark_trend: Dict[str, str],
+    benchmark_range: str = "5%",
+    benchmark_required: int = 3,
+) -> pd.DataFrame:
+    """
+    Runs the Dana benchmark analysis on all the series of a build at once.
+    `history` has one row per sample (series_id, build_id, sample_value) and must include the analysed build.
+    A series regresses when its last `benchmark_required` samples are all worse than the average
+    of the samples before them by more than `benchmark_range`, given its `benchmark_trend`.
+    """
+    columns = ["series_id", "status", "base_value", "current_value", "delta"]
+    build_id = int(build_id)
+    history = history[history["build_id"] <= build_id]
+    if build_id not in set(history["build_id"]):
+        return pd.DataFrame(columns=columns)
+
+    samples = history.pivot(index="series_id", columns="build_id", values="sample_value")
+    samples = samples.sort_index(axis=1)
+    # only analyse the series that have a sample for this build
+    samples = samples[samples[build_id].notna()]
+
+    values = samples.to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+
+    # number of valid samples at or after each build, per series
+    rank_from_end = np.cumsum(valid[:, ::-1], axis=1)[:, ::-1]
+    current_mask = valid & (rank_from_end <= benchmark_required)
+    base_mask = valid & (rank_from_end > benchmark_required)
+
+    num_current = current_mask.sum(axis=1)
+    num_base = base_mask.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        base_value = np.where(base_mask, values, 0.0).sum(axis=1) / num_base
+
+    tolerance, is_relative = parse_range(benchmark_range)
+    tolerance = (
+        np.abs(base_value) * tolerance if is_relative else np.full_like(base_value, tolerance)
+    )
+
+    # +1 when higher values are worse, -1 when lower values are worse
+    sign = np.array(
+        [-1.0 if benchmark_trend.get(s, "smaller") == "higher" else 1.0 for s in samples.index]
+    )
+    deviation = sign[:, None] * (values - base_value[:, None])
+
+    with np.errstate(invalid="ignore"):
+        num_worse = (current_mask & (deviation > tolerance[:, None])).sum(axis=1)
+        num_better = (current_mask & (deviation < -tolerance[:, None])).sum(axis=1)
+
+    sufficient = (num_base > 0) & (num_current == benchmark_required)
+    status = np.full(len(samples), STABLE, dtype=object)
+    status[sufficient & (num_worse == benchmark_required)] = REGRESSION
+    status[sufficient & (num_better == benchmark_required)] = IMPROVEMENT
+    status[~sufficient] = INSUFFICIENT
+
+    current_value = values[:, -1]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        delta = (current_value - base_value) / np.abs(base_value)
+
+    return pd.DataFrame(
+        {
+            "series_id": samples.index.to_numpy(),
+            "status": status,
+            "base_value": base_value,
+            "current_value": current_value,
+            "delta": delta,
+        },
+        columns=columns,
+    )
+
+
+def analyse_build(
+    connection: sqlite3.Connection,
+    project_id: str,
+    build_id: int,
+    series: List[Dict[str, Any]],
+    benchmark_range: str = "5%",
+    benchmark_required: int = 3,
+    last_n: Optional[int] = ANALYSIS_WINDOW,
+) -> pd.DataFrame:
+    """
+    Analyses a parsed build (see `build_utils.parse_build`) against the series history in the local store.
+    """
+    history = get_project_history(connection=connection, project_id=project_id, last_n=last_n)
+    history = history[history["build_id"] != int(build_id)]
+    current = pd.DataFrame(
+        {
+            "series_id": [s["series_id"] for s in series],
+            "build_id": int(build_id),
+            "sample_value": [float(s["sample_value"]) for s in series],
+        }
+    )
+
+    return detect_regressions(
+        history=pd.concat([history, current], ignore_index=True),
+        build_id=build_id,
+        benchmark_trend={s["series_id"]: s["benchmark_trend"] for s in series},
+        benchmark_range=benchmark_range,
+        benchmark_required=benchmark_required,
+    )
+
+
+def detect_shifts(
+    before: Dict[str, float],
+    after: Dict[str, float],
+    benchmark_range: str = "5%",
+) -> Dict[str, float]:
+    """
+    Returns the relative change of the series that moved by more than `benchmark_range` between two builds.
+    """
+    series_ids = sorted(set(before) & set(after))
+    if not series_ids:
+        return {}
+
+    before_values = np.array([before[s] for s in series_ids], dtype=float)
+    after_values = np.array([after[s] for s in series_ids], dtype=float)
+
+    tolerance, is_relative = parse_range(benchmark_range)
+    if is_relative:
+        tolerance = np.abs(before_values) * tolerance
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        delta = (after_values - before_values) / np.abs(before_values)
+    shifted = np.abs(after_values - before_values) > tolerance
+
+    return {s: float(d) for s, d, moved in zip(series_ids, delta, shifted) if moved}
+
+
+def bisect_shifts(
+    num_commits: int,
+    measure: Callable[[int], Dict[str, float]],
+    num_samples: int = 2,
+    benchmark_range: str = "5%",
+) -> Dict[int, Dict[str, float]]:
+    """
+    Locates the commits, by index from oldest to newest, whose series moved by more than
+    `benchmark_range` compared to the previous commit. `measure(index)` returns the samples
+    of a commit. The window endpoints and `num_samples` evenly spaced commits are measured first,
+    then only the midpoints of the intervals where a series moved, until the culprits are isolated.
+    Every commit is measured at most once. Returns the shifts (see `detect_shifts`) of each culprit.
+    """
+    samples = {}
+
+    def get_samples(index: int) -> Dict[str, float]:
+        if index not in samples:
+            samples[index] = measure(index)
+        return samples[index]
+
+    last = num_commits - 1
+    indices = sorted({round(k * last / (num_samples + 1)) for k in range(num_samples + 2)})
+    for index in indices:
+        get_samples(index)
+
+    culprits = {}
+    intervals = list(zip(indices[:-1], indices[1:]))
+    while intervals:
+        before, after = intervals.pop()
+        shifts = detect_shifts(
+            before=get_samples(before),
+            after=get_samples(after),
+            benchmark_range=benchmark_range,
+        )
+        if not shifts:
+            continue
+
+        if after - before == 1:
+            culprits[after] = shifts
+            continue
+
+        middle = (before + after) // 2
+        intervals += [(before, middle), (middle, after)]
+
+    return dict(sorted(culprits.items()))
+
+
+def has_regressions(report: pd.DataFrame) -> bool:
+    """
+    Whether a regression report contains at least one regressed series.
+    """
+    return report is not None and bool((report["status"] == REGRESSION).any())
+
+
+def format_regression_report(report: pd.DataFrame) -> str:
+    """
+    Formats the regressed and improved series of a report for printing.
+    """
+    changed = report[report["status"].isin([REGRESSION, IMPROVEMENT])]
+    if changed.empty:
+        return f"No regression detected over {len(report)} series."
+
+    changed = changed.assign(delta=(changed["delta"] * 100).map("{:+.2f}%".format))
+
+    return changed.to_string(index=False)
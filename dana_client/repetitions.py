@@ -0,0 +1,97 @@
+import math
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# repeated runs of a benchmark are written to sibling folders with this prefix
+REPETITION_PREFIX = "rep_"
+# analysis range of the dispersion companion series: a change of less than 100 CV points never
+# alerts, the dispersion of the runs varies far more than the metrics between builds
+COMPANION_RANGE = "100"
+
+# two-sided 95% Student t quantiles by degrees of freedom
+T_QUANTILES = {
+    1: 12.706,
+    2: 4.303,
+    3: 3.182,
+    4: 2.776,
+    5: 2.571,
+    6: 2.447,
+    7: 2.365,
+    8: 2.306,
+    9: 2.262,
+    10: 2.228,
+    15: 2.131,
+    20: 2.086,
+    30: 2.042,
+}
+
+
+def find_repetitions(benchmark_folder: Path) -> Optional[List[Path]]:
+    """
+    Returns the inference results of a benchmark folder: either a single run or the repetitions of one run.
+    Returns None if the folder holds several different runs (e.g. a sweep).
+    """
+    results = sorted(benchmark_folder.glob("**/inference_results.csv"))
+    if len(results) == 1:
+        return results
+
+    if (
+        results
+        and all(r.parent.name.startswith(REPETITION_PREFIX) for r in results)
+        and len({r.parent.parent for r in results}) == 1
+    ):
+        return results
+
+    return None
+
+
+def aggregate_values(values: List[float], aggregation: str = "median") -> float:
+    """
+    Aggregates repeated measurements with their "median", "mean" or 10% "trimmed_mean".
+    """
+    values = np.sort(np.asarray(values, dtype=float))
+
+    if aggregation == "median":
+        return float(np.median(values))
+    if aggregation == "mean":
+        return float(np.mean(values))
+    if aggregation == "trimmed_mean":
+        trim = int(len(values) * 0.1)
+        return float(np.mean(values[trim : len(values) - trim]))
+
+    raise ValueError(f"Unknown aggregation {aggregation}")
+
+
+def coefficient_of_variation(values: List[float]) -> float:
+    """
+    Returns the sample standard deviation of the values relative to their mean, in percent.
+    """
+    values = np.asarray(values, dtype=float)
+    if len(values) < 2:
+        return 0.0
+
+    return float(100 * np.std(values, ddof=1) / abs(np.mean(values)))
+
+
+def get_series_range(series: Dict[str, Any], benchmark_range: str) -> str:
+    """
+    Returns the analysis range of a parsed series (see `build_utils.parse_build`).
+    """
+    return COMPANION_RANGE if series.get("companion") else benchmark_range
+
+
+def relative_confidence_interval(values: List[float]) -> float:
+    """
+    Returns the half width of the 95% confidence interval of the mean, relative to the mean.
+    """
+    values = np.asarray(values, dtype=float)
+    if len(values) < 2:
+        return math.inf
+
+    degrees = len(values) - 1
+    quantile = T_QUANTILES[max(d for d in T_QUANTILES if d <= degrees)] if degrees <= 30 else 1.96
+    half_width = quantile * np.std(values, ddof=1) / math.sqrt(len(values))
+
+    return float(half_width / abs(np.mean(values)))
@@ -0,0 +1,68 @@
+import json
+import shutil
+import hashlib
+from pathlib import Path
+from typing import List, Optional
+
+from git import Commit, Repo
+
+
+def get_cache_key(
+    repo: Repo,
+    commit: Commit,
+    relevant_paths: List[str],
+    config_dir: Path = Path("benchmarks"),
+) -> str:
+    """
+    Hashes the git trees of the relevant paths of a commit together with the benchmark configs,
+    so that commits that don't touch benchmarked code share the same key.
+    A relevant path missing from the commit (e.g. a typo) is replaced by the whole tree of the
+    commit, so that it can't make unrelated commits share a key.
+    """
+    key = hashlib.sha256()
+
+    for path in sorted(relevant_paths):
+        try:
+            tree_hash = repo.git.rev_parse(f"{commit.hexsha}:{path}")
+        except Exception:
+            print(f"Relevant path {path} is missing from commit {commit.hexsha}, keying the commit")
+            tree_hash = f"missing {commit.tree.hexsha}"
+        key.update(f"{path}:{tree_hash}\n".encode("utf-8"))
+
+    for config_file in sorted(Path(config_dir).rglob("*")):
+        if config_file.is_file():
+            key.update(f"{config_file.relative_to(config_dir)}\n".encode("utf-8"))
+            key.update(config_file.read_bytes())
+
+    return key.hexdigest()
+
+
+def load_cached_results(cache_dir: Path, key: str, folder: Path) -> Optional[str]:
+    """
+    Copies the cached results of a key to the folder.
+    Returns the id of the build that produced them, or None if the key is not cached.
+    """
+    info_path = Path(cache_dir) / f"{key}.json"
+    if not info_path.exists():
+        return None
+
+    shutil.rmtree(folder, ignore_errors=True)
+    shutil.copytree(Path(cache_dir) / key, folder)
+
+    return json.load(open(info_path))["build_id"]
+
+
+def save_cached_results(cache_dir: Path, key: str, build_id: str, folder: Path) -> None:
+    """
+    Copies the results of a build to the cache. The key info is written last so that
+    an interrupted copy is never used.
+    """
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    shutil.rmtree(cache_dir / key, ignore_errors=True)
+    shutil.copytree(folder, cache_dir / key)
+
+    with open(cache_dir / f"{key}.json.tmp", "w") as f:
+        json.dump({"build_id": build_id}, f)
+    (cache_dir / f"{key}.json.tmp").replace(cache_dir / f"{key}.json")
@@ -0,0 +1,220 @@
+import json
+import sqlite3
+from pathlib import Path
+from argparse import ArgumentParser
+from typing import Any, Dict, List, Optional, Union
+
+import pandas as pd
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    project_id TEXT NOT NULL,
+    build_id INTEGER NOT NULL,
+    build_url TEXT NOT NULL DEFAULT '',
+    build_hash TEXT NOT NULL DEFAULT '',
+    build_subject TEXT NOT NULL DEFAULT '',
+    build_abbrev_hash TEXT NOT NULL DEFAULT '',
+    build_author_name TEXT NOT NULL DEFAULT '',
+    build_author_email TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (project_id, build_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS series (
+    project_id TEXT NOT NULL,
+    series_id TEXT NOT NULL,
+    series_unit TEXT NOT NULL DEFAULT '',
+    benchmark_range TEXT NOT NULL DEFAULT '5%',
+    benchmark_required INTEGER NOT NULL DEFAULT 3,
+    benchmark_trend TEXT NOT NULL DEFAULT 'smaller',
+    PRIMARY KEY (project_id, series_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS samples (
+    project_id TEXT NOT NULL,
+    series_id TEXT NOT NULL,
+    build_id INTEGER NOT NULL,
+    sample_value REAL NOT NULL,
+    PRIMARY KEY (project_id, series_id, build_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS samples_by_build ON samples (project_id, build_id);
+
+CREATE TABLE IF NOT EXISTS build_fingerprints (
+    project_id TEXT NOT NULL,
+    build_id INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    PRIMARY KEY (project_id, build_id)
+) WITHOUT ROWID;
+"""
+
+
+def connect_store(store_path: Union[str, Path]) -> sqlite3.Connection:
+    """
+    Opens (and creates if needed) the local results store.
+    """
+    # concurrent publishers wait for each other's writes
+    connection = sqlite3.connect(str(store_path), timeout=60)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+
+    return connection
+
+
+def add_build_samples(
+    connection: sqlite3.Connection,
+    project_id: str,
+    build_id: int,
+    series: List[Dict[str, Any]],
+    build_url: str = "",
+    build_hash: str = "",
+    build_abbrev_hash: str = "",
+    build_author_name: str = "",
+    build_author_email: str = "",
+    build_subject: str = "",
+    average_range: str = "5%",
+    average_min_count: int = 3,
+    fingerprint: Optional[Dict[str, Any]] = None,
+) -> None:
+    """
+    Writes a parsed build (see `build_utils.parse_build`) to the local store, replacing any previous samples.
+    The `fingerprint` of the runner that benchmarked the build is stored with it.
+    """
+    build_id = int(build_id)
+
+    with connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO builds VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                project_id,
+                build_id,
+                build_url,
+                build_hash,
+                build_subject,
+                build_abbrev_hash,
+                build_author_name,
+                build_author_email,
+            ),
+        )
+        connection.executemany(
+            "INSERT OR REPLACE INTO series VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    project_id,
+                    s["series_id"],
+                    s["series_unit"],
+                    average_range,
+                    average_min_count,
+                    s["benchmark_trend"],
+                )
+                for s in series
+            ],
+        )
+        connection.executemany(
+            "INSERT OR REPLACE INTO samples VALUES (?, ?, ?, ?)",
+            [(project_id, s["series_id"], build_id, float(s["sample_value"])) for s in series],
+        )
+        if fingerprint is not None:
+            connection.execute(
+                "INSERT OR REPLACE INTO build_fingerprints VALUES (?, ?, ?)",
+                (project_id, build_id, json.dumps(fingerprint, sort_keys=True)),
+            )
+
+
+def get_series_history(
+    connection: sqlite3.Connection,
+    project_id: str,
+    series_id: str,
+    last_n: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Returns the samples of a series over its last `last_n` builds (all builds if None), oldest first.
+    """
+    query = (
+        "SELECT build_id, sample_value FROM samples "
+        "WHERE project_id = ? AND series_id = ? ORDER BY build_id DESC"
+    )
+    params: List[Any] = [project_id, series_id]
+    if last_n is not None:
+        query += " LIMIT ?"
+        params.append(last_n)
+
+    history = pd.read_sql_query(query, connection, params=params)
+
+    return history.iloc[::-1].reset_index(drop=True)
+
+
+def get_build_samples(
+    connection: sqlite3.Connection,
+    project_id: str,
+    build_id: int,
+) -> pd.DataFrame:
+    """
+    Returns all the series samples of a build.
+    """
+    query = (
+        "SELECT samples.series_id, series.series_unit, samples.sample_value FROM samples "
+        "LEFT JOIN series USING (project_id, series_id) "
+        "WHERE samples.project_id = ? AND samples.build_id = ? ORDER BY samples.series_id"
+    )
+
+    return pd.read_sql_query(query, connection, params=[project_id, int(build_id)])
+
+
+def get_project_history(
+    connection: sqlite3.Connection,
+    project_id: str,
+    last_n: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Returns the samples of all series of a project over its last `last_n` builds (all builds if None).
+    """
+    query = "SELECT series_id, build_id, sample_value FROM samples WHERE project_id = ?"
+    params: List[Any] = [project_id]
+    if last_n is not None:
+        query += (
+            " AND build_id IN (SELECT build_id FROM builds WHERE project_id = ? "
+            "ORDER BY build_id DESC LIMIT ?)"
+        )
+        params += [project_id, last_n]
+    query += " ORDER BY series_id, build_id"
+
+    return pd.read_sql_query(query, connection, params=params)
+
+
+def main():
+    parser = ArgumentParser()
+
+    parser.add_argument("--store", type=str, required=True)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    series_parser = subparsers.add_parser("series")
+    series_parser.add_argument("--project-id", type=str, required=True)
+    series_parser.add_argument("--series-id", type=str, required=True)
+    series_parser.add_argument("--last", type=int, default=None)
+
+    build_parser = subparsers.add_parser("build")
+    build_parser.add_argument("--project-id", type=str, required=True)
+    build_parser.add_argument("--build-id", type=int, required=True)
+
+    args = parser.parse_args()
+
+    connection = connect_store(args.store)
+
+    if args.command == "series":
+        results = get_series_history(
+            connection=connection,
+            project_id=args.project_id,
+            series_id=args.series_id,
+            last_n=args.last,
+        )
+    else:
+        results = get_build_samples(
+            connection=connection,
+            project_id=args.project_id,
+            build_id=args.build_id,
+        )
+
+    connection.close()
+
+    print(results.to_string(index=False))
@@ -0,0 +1,109 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+from requests import Session
+from typing import Any, Dict, List, Optional
+
+from .api import build_exists, get_series, get_series_samples, project_exists
+from .repetitions import get_series_range
+
+
+def diff_build(
+    url: str,
+    session: Session,
+    api_token: str,
+    project_id: str,
+    build_id: int,
+    series: List[Dict[str, Any]],
+    average_range: str = "5%",
+    average_min_count: int = 3,
+    tolerance: float = 1e-6,
+    max_workers: int = 1,
+) -> Dict[str, Any]:
+    """
+    Compares a parsed build (see `build_utils.parse_build`) with the state of the Dana Server
+    and returns the plan of the requests needed to bring the server up to date.
+    Sample values are compared with a relative `tolerance`.
+    The series are fetched by `max_workers` threads, through the session's limiter if it has one.
+    """
+    plan = {
+        "add_project": False,
+        "add_build": False,
+        "add_series": [],
+        "add_sample": [],
+        "unchanged": [],
+    }
+
+    p_exists = project_exists(
+        url=url,
+        session=session,
+        api_token=api_token,
+        project_id=project_id,
+    )
+    if not p_exists:
+        plan["add_project"] = True
+        plan["add_build"] = True
+        plan["add_series"] = [s["series_id"] for s in series]
+        plan["add_sample"] = [s["series_id"] for s in series]
+        return plan
+
+    plan["add_build"] = not build_exists(
+        url=url,
+        session=session,
+        api_token=api_token,
+        project_id=project_id,
+        build_id=build_id,
+    )
+
+    def fetch_series(s: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return get_series(
+            url=url,
+            session=session,
+            api_token=api_token,
+            project_id=project_id,
+            series_id=s["series_id"],
+        )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        servers_series = list(executor.map(fetch_series, series))
+
+    for s, server_series in zip(series, servers_series):
+        if server_series is None:
+            plan["add_series"].append(s["series_id"])
+            plan["add_sample"].append(s["series_id"])
+            continue
+
+        server_benchmark = server_series.get("analyse", {}).get("benchmark", {})
+        series_range = get_series_range(s, average_range)
+        if (
+            server_series.get("description", s["series_description"]) != s["series_description"]
+            or server_benchmark.get("range", series_range) != series_range
+            or server_benchmark.get("required", average_min_count) != average_min_count
+            or server_benchmark.get("trend", s["benchmark_trend"]) != s["benchmark_trend"]
+        ):
+            plan["add_series"].append(s["series_id"])
+
+        server_value = get_series_samples(server_series).get(str(build_id))
+        if server_value is None or not math.isclose(
+            float(server_value), float(s["sample_value"]), rel_tol=tolerance
+        ):
+            plan["add_sample"].append(s["series_id"])
+        else:
+            plan["unchanged"].append(s["series_id"])
+
+    return plan
+
+
+def format_sync_plan(plan: Dict[str, Any]) -> str:
+    """
+    Formats a sync plan for printing.
+    """
+    lines = []
+    if plan["add_project"]:
+        lines.append("add project")
+    if plan["add_build"]:
+        lines.append("add build")
+    lines += [f"add series {series_id}" for series_id in plan["add_series"]]
+    lines += [f"add sample {series_id}" for series_id in plan["add_sample"]]
+    lines.append(f"{len(plan['unchanged'])} samples unchanged")
+
+    return "\n".join(lines)
@@ -1,147 +1,1073 @@
 import os
+import sys
+import json
+import time
+import signal
+import heapq
 import shutil
+import warnings
+import tempfile
+import traceback
 import subprocess
 from pathlib import Path
+from dataclasses import dataclass, replace
 from requests import Session
+from typing import Any, Dict, List, Optional, Tuple
 from argparse import ArgumentParser
 
-from git import Repo
+import pandas as pd
+from git import Commit, Repo
 
-from .api import login, build_exists, project_exists, add_project
-from .build_utils import publish_build, upload_build
+from .api import (
+    login,
+    configure,
+    get_stats,
+    format_stats,
+    build_exists,
+    project_exists,
+    add_project,
+)
+from .build_utils import parse_build, publish_build, upload_build
+from .concurrency import AdaptiveLimiter, format_limiter_summary, parse_rate_limits
+from .regression import (
+    REGRESSION,
+    bisect_shifts,
+    format_regression_report,
+    has_regressions,
+)
+from .store import connect_store, get_build_samples, get_series_history
+from .repetitions import REPETITION_PREFIX, relative_confidence_interval
+from .checkpoint import get_journal_path, load_journal, record_config, record_stage, start_journal
+from .result_cache import get_cache_key, load_cached_results, save_cached_results
+from .mirrors import format_targets_report, get_targets_report, login_mirrors, setup_mirrors
+from .pipeline import BackgroundPublisher
+from .fingerprint import (
+    get_editable_packages,
+    get_fingerprint,
+    get_fingerprint_class,
+    load_fingerprint,
+    namespace_series,
+    save_fingerprint,
+)
+from .profiling import (
+    PROFILERS,
+    PROFILE_COLLAPSED,
+    PROFILE_DIFF_COLLAPSED,
+    PROFILE_DIFF_FLAMEGRAPH,
+    PROFILE_FLAMEGRAPH,
+    cprofile_to_collapsed,
+    diff_collapsed,
+    get_profiler_command,
+    read_collapsed,
+    render_flamegraph,
+    write_collapsed,
+    write_diff_collapsed,
+)
 
+from huggingface_hub import HfApi, hf_hub_download
+from huggingface_hub.utils import EntryNotFoundError
 
-def update_project(
+# seconds given to a timed out benchmark to terminate before it is killed
+KILL_GRACE_PERIOD = 30
+# benchmarked builds waiting to be published in the background
+STAGING_DIR = Path("staging")
+
+
+@dataclass
+class RunOptions:
+    """
+    Options of a benchmarking run, shared by `benchmark_commit` and the project modes.
+    - `average_range`, `average_min_count`: analysis settings of the published series.
+    - `debug`: shows the output of the install and benchmark commands.
+    - `store_path`: local results store, the builds are analysed for regressions against it.
+    - `max_workers`: threads publishing the series (see `concurrency.AdaptiveLimiter`).
+    - `result_cache`: with `relevant_paths`, the results of an earlier build with the same
+      `relevant_paths` trees and benchmark configs are republished instead of benchmarking
+      (see `result_cache.get_cache_key`), `mark_reused` flags them in the build subject.
+    - `repetitions`, `min_repetitions`, `target_ci`: repeated runs (see `run_benchmarks`),
+      aggregated with `aggregation`.
+    - `config_timeout`, `config_retries`: a config that fails or times out after its retries is
+      skipped and the others are published, unless all of them failed.
+    - `checkpoint_dir`: the progress of every commit is journaled so that an interrupted run
+      resumes where it left off instead of benchmarking the commit from scratch.
+    - `fingerprint_series`: series are namespaced by the runner fingerprint class
+      (see `fingerprint.namespace_series`).
+    - `profiler`: every config is profiled and the profiles of the benchmarks with regressed
+      series are diffed against the last build before the regression (requires `store_path`).
+    - `pipeline`: builds are uploaded and published in the background while the next commit is
+      benchmarked, with at most `max_staged` builds waiting to be published.
+    """
+
+    average_range: str = "5%"
+    average_min_count: int = 3
+    debug: bool = False
+    store_path: Optional[Path] = None
+    max_workers: int = 1
+    result_cache: Optional[Path] = None
+    relevant_paths: Optional[List[str]] = None
+    mark_reused: bool = False
+    repetitions: int = 1
+    min_repetitions: int = 3
+    target_ci: Optional[float] = None
+    aggregation: str = "median"
+    config_timeout: Optional[float] = None
+    config_retries: int = 0
+    checkpoint_dir: Optional[Path] = None
+    fingerprint_series: bool = False
+    profiler: Optional[str] = None
+    pipeline: bool = False
+    max_staged: int = 1
+
+
+def setup_project(
     url: str,
     session: Session,
     api_token: str,
+    project_id: str,
+    mirrors: Optional[List[Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Creates the project on the server and its `mirrors` if it doesn't exist.
+    Returns the mirrors it was set up on, a failing mirror is left out of the run
+    (see `mirrors.setup_mirrors`).
+    """
+
+    def setup_target(target: Dict[str, Any]) -> None:
+        p_exists = project_exists(
+            url=target["url"],
+            session=target["session"],
+            api_token=target["api_token"],
+            project_id=project_id,
+        )
+        if not p_exists:
+            add_project(
+                url=target["url"],
+                session=target["session"],
+                api_token=target["api_token"],
+                project_id=project_id,
+                override=True,
+            )
+
+    setup_target({"url": url, "session": session, "api_token": api_token})
+
+    return setup_mirrors(mirrors=mirrors, setup=setup_target, label=f"setup of {project_id}")
+
+
+def clone_watch_repo(watch_repo: str) -> Repo:
+    try:
+        repo = Repo.clone_from(watch_repo, "watch_repo")
+    except Exception:
+        repo = Repo("watch_repo")
+
+    return repo
+
+
+def install_commit(repo: Repo, commit: Commit, debug: bool = False) -> None:
+    """
+    Checks out the commit and installs the watched repository.
+    """
+    repo.git.checkout(commit.hexsha)
+    # run the install command and omit stdout (devnull)
+    out = subprocess.run(
+        ["pip", "install", "-e", "watch_repo"],
+        stdout=subprocess.DEVNULL if not debug else None,
+        stderr=subprocess.STDOUT if not debug else None,
+    )
+
+    if out.returncode != 0:
+        raise RuntimeError("Install failed!")
+
+
+def run_command(command: List[str], debug: bool = False, timeout: Optional[float] = None) -> bool:
+    """
+    Runs a command in its own process group, killing the whole group if it exceeds `timeout` seconds.
+    Returns whether the command succeeded.
+    """
+    # omit stdout (devnull)
+    process = subprocess.Popen(
+        command,
+        stdout=subprocess.DEVNULL if not debug else None,
+        stderr=subprocess.STDOUT if not debug else None,
+        start_new_session=True,
+    )
+
+    try:
+        return process.wait(timeout=timeout) == 0
+    except BaseException:
+        # timeouts, but also Ctrl-C / CI cancellation, which don't reach the new session
+        kill_process_group(process)
+        raise
+
+
+def kill_process_group(process: subprocess.Popen) -> None:
+    """
+    Terminates the process group of `process`, escalating to SIGKILL after a grace period.
+    """
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+
+    try:
+        process.wait(timeout=KILL_GRACE_PERIOD)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        process.wait()
+
+
+def profile_config(
+    config_name: str,
+    profiler: str,
+    folders: List[Path],
+    debug: bool = False,
+    timeout: Optional[float] = None,
+) -> None:
+    """
+    Runs a benchmark config once more under `profiler` and writes its collapsed stacks and
+    flamegraph to the benchmark `folders` of the config. The results of the profiled run are
+    discarded so that the profiler overhead doesn't bias the published ones.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = Path(tmp_dir) / "profile"
+        command = get_profiler_command(
+            command=[
+                "optimum-benchmark",
+                "--config-dir",
+                "benchmarks",
+                "--config-name",
+                config_name,
+                "--multirun",
+                f"hydra.sweep.dir={tmp_dir}/sweep",
+            ],
+            profiler=profiler,
+            output_path=output_path,
+        )
+        try:
+            succeeded = run_command(command=command, debug=debug, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            succeeded = False
+        except OSError as e:
+            # e.g. the profiler isn't installed, the benchmark results are still published
+            print(f"Profiling {config_name} with {profiler} failed: {e!r}")
+            return
+
+        if not succeeded or not output_path.exists():
+            print(f"Profiling {config_name} with {profiler} failed")
+            return
+
+        if profiler == "cprofile":
+            stacks = cprofile_to_collapsed(output_path)
+        else:
+            stacks = read_collapsed(output_path)
+
+    for folder in folders:
+        write_collapsed(folder / PROFILE_COLLAPSED, stacks)
+        (folder / PROFILE_FLAMEGRAPH).write_text(
+            render_flamegraph(stacks, title=f"{folder.name} ({profiler})")
+        )
+
+
+def diff_regressed_profiles(
+    report: pd.DataFrame,
     dataset_id: str,
     hf_token: str,
     project_id: str,
-    watch_repo: str,
-    num_commits: int = 10,
-    average_range: str = "5%",
+    build_id: str,
+    store_path: Path,
     average_min_count: int = 3,
+    folder: Path = Path("experiments"),
+) -> None:
+    """
+    Diffs the profile of every benchmark with a regressed series against the profile of the
+    last build before the regression, downloaded from the dataset, and uploads the differential
+    collapsed stacks and flamegraph next to the build's profile.
+    """
+    regressed = list(report[report["status"] == REGRESSION]["series_id"])
+    if not regressed:
+        return
+
+    connection = connect_store(store_path)
+    diffed = False
+    for benchmark_folder in sorted(Path(folder).iterdir()):
+        series_ids = [s for s in regressed if s.startswith(f"{benchmark_folder.name}_")]
+        if not series_ids or not (benchmark_folder / PROFILE_COLLAPSED).exists():
+            continue
+
+        # the regression window is the last `average_min_count` builds
+        history = get_series_history(
+            connection=connection,
+            project_id=project_id,
+            series_id=series_ids[0],
+            last_n=average_min_count + 1,
+        )
+        if len(history) <= average_min_count:
+            continue
+        base_build_id = int(history["build_id"].iloc[0])
+
+        try:
+            base_profile = hf_hub_download(
+                repo_id=dataset_id,
+                filename=f"{project_id}/{base_build_id}/{benchmark_folder.name}/{PROFILE_COLLAPSED}",
+                repo_type="dataset",
+                token=hf_token,
+            )
+        except EntryNotFoundError:
+            print(f"No profile of {benchmark_folder.name} in build {base_build_id} to diff against")
+            continue
+        except Exception as e:
+            print(f"Downloading the profile of {benchmark_folder.name} failed: {e!r}")
+            continue
+
+        before = read_collapsed(base_profile)
+        after = read_collapsed(benchmark_folder / PROFILE_COLLAPSED)
+        write_diff_collapsed(
+            benchmark_folder / PROFILE_DIFF_COLLAPSED, diff_collapsed(before, after)
+        )
+        (benchmark_folder / PROFILE_DIFF_FLAMEGRAPH).write_text(
+            render_flamegraph(
+                after,
+                title=f"{benchmark_folder.name}: build {base_build_id} -> {build_id}",
+                before=before,
+            )
+        )
+        print(f"Profile diff of {benchmark_folder.name} against build {base_build_id} written")
+        diffed = True
+
+    connection.close()
+
+    if diffed:
+        HfApi().upload_folder(
+            repo_id=dataset_id,
+            folder_path=folder,
+            path_in_repo=f"{project_id}/{build_id}",
+            allow_patterns=[f"*/{PROFILE_DIFF_COLLAPSED}", f"*/{PROFILE_DIFF_FLAMEGRAPH}"],
+            repo_type="dataset",
+            token=hf_token,
+        )
+
+
+def run_benchmarks(
     debug: bool = False,
-):
+    repetitions: int = 1,
+    min_repetitions: int = 3,
+    target_ci: Optional[float] = None,
+    timeout: Optional[float] = None,
+    retries: int = 0,
+    journal_path: Optional[Path] = None,
+    profiler: Optional[str] = None,
+) -> List[Dict[str, Any]]:
     """
-    Updates a dana project that's monitoring a git repository.
+    Runs all the benchmark configs, writing their results to the experiments folder.
+    With `repetitions` > 1, each config is run up to `repetitions` times into `rep_<i>` folders,
+    stopping early once at least `min_repetitions` runs were made and the 95% confidence interval
+    of the forward latency is narrower than `target_ci` (relative half width) for all its benchmarks.
+    A run that fails or exceeds `timeout` seconds is retried `retries` times, after which the config
+    is given up and the other configs are still run.
+    With a checkpoint `journal_path`, the configs already recorded in the journal are skipped (see
+    `start_journal` for the failed ones) and every completed config is recorded with the artifacts
+    it produced.
+    With a `profiler`, each config that succeeded is profiled (see `profile_config`).
+    Returns the failed configs, which are also written to `experiments/failures.json`.
     """
+    completed = load_journal(journal_path)["configs"] if journal_path is not None else {}
+    failures = [config["failure"] for config in completed.values() if config["failure"]]
 
-    p_exists = project_exists(
+    Path("experiments").mkdir(exist_ok=True)
+
+    for config_file in sorted(os.listdir("benchmarks")):
+        # get config name
+        config_name = os.path.splitext(config_file)[0]
+        # skip _base_ and the configs completed before an interruption
+        if config_name == "_base_" or config_name in completed:
+            continue
+
+        previous_artifacts = set(os.listdir("experiments"))
+        previous_results = set(Path("experiments").glob("**/inference_results.csv"))
+        failure = None
+
+        for repetition in range(repetitions):
+            command = [
+                "optimum-benchmark",
+                "--config-dir",
+                "benchmarks",
+                "--config-name",
+                config_name,
+                "--multirun",
+            ]
+            if repetitions > 1:
+                command.append(
+                    f"hydra.sweep.subdir=${{hydra.job.num}}/{REPETITION_PREFIX}{repetition}"
+                )
+
+            start = time.perf_counter()
+            for _ in range(retries + 1):
+                try:
+                    succeeded = run_command(command=command, debug=debug, timeout=timeout)
+                    timed_out = False
+                except subprocess.TimeoutExpired:
+                    succeeded = False
+                    timed_out = True
+
+                if succeeded:
+                    break
+
+                if repetitions > 1:
+                    # drop the partial results of the failed run
+                    for folder in Path("experiments").glob(f"**/{REPETITION_PREFIX}{repetition}"):
+                        if set(folder.glob("inference_results.csv")) & previous_results:
+                            continue
+                        shutil.rmtree(folder)
+
+            if not succeeded:
+                failure = {
+                    "config_name": config_name,
+                    "repetition": repetition,
+                    "attempts": retries + 1,
+                    "timed_out": timed_out,
+                    "duration": time.perf_counter() - start,
+                }
+                print(f"Benchmark {config_name} failed after {retries + 1} attempts")
+                break
+
+            if target_ci is None or repetition + 1 < min_repetitions:
+                continue
+
+            # group the repetitions of each benchmark of the config
+            latencies = {}
+            for results in set(Path("experiments").glob("**/inference_results.csv")):
+                if results not in previous_results:
+                    latency = pd.read_csv(results)["forward.latency(s)"][0]
+                    latencies.setdefault(results.parent.parent, []).append(latency)
+
+            if all(relative_confidence_interval(v) < target_ci for v in latencies.values()):
+                break
+
+        if failure is not None:
+            failures.append(failure)
+        elif profiler is not None:
+            new_folders = [
+                Path("experiments") / artifact
+                for artifact in sorted(set(os.listdir("experiments")) - previous_artifacts)
+                if (Path("experiments") / artifact).is_dir()
+            ]
+            if new_folders:
+                profile_config(
+                    config_name=config_name,
+                    profiler=profiler,
+                    folders=new_folders,
+                    debug=debug,
+                    timeout=timeout,
+                )
+
+        if journal_path is not None:
+            record_config(
+                journal_path=journal_path,
+                config_name=config_name,
+                artifacts=list(set(os.listdir("experiments")) - previous_artifacts),
+                failure=failure,
+            )
+
+    with open(Path("experiments") / "failures.json", "w") as f:
+        json.dump(failures, f, indent=2)
+
+    return failures
+
+
+def run_commit(
+    repo: Repo,
+    commit: Commit,
+    project_id: str,
+    watch_repo: str,
+    options: RunOptions,
+    staging: bool = False,
+) -> Dict[str, Any]:
+    """
+    Installs and benchmarks a commit (see `benchmark_commit`).
+    With `staging`, the results are moved from the experiments folder to `staging/<build_id>`,
+    so that the next commit can be benchmarked while they are published. A build already staged for
+    the same commit (e.g. skipped after a publish failure) is returned without benchmarking it again.
+    Returns the build to publish: its results folder, infos and checkpoint journal.
+    """
+    build_id = str(commit.count())
+
+    # get build info
+    build = {
+        "build_id": build_id,
+        "build_url": f"{watch_repo}/commit/{commit}",
+        "build_hash": commit.hexsha,
+        "build_subject": commit.message,
+        "build_abbrev_hash": commit.hexsha[:7],
+        "build_author_name": commit.author.name,
+        "build_author_email": commit.author.email,
+        "reused_from": None,
+        "folder": "experiments",
+        "journal_path": None,
+    }
+
+    # the build was benchmarked and staged before an interruption or a publish failure
+    staged_build = load_staged_build(build_id)
+    if staged_build is not None and staged_build["build_hash"] == build["build_hash"]:
+        print(f"Resuming the staged build {build_id}")
+        return staged_build
+
+    if options.checkpoint_dir is not None:
+        journal_path = get_journal_path(
+            checkpoint_dir=options.checkpoint_dir,
+            project_id=project_id,
+            build_id=build_id,
+        )
+        build["journal_path"] = str(journal_path)
+
+        start_journal(
+            journal_path=journal_path,
+            build_hash=build["build_hash"],
+            folder=Path("experiments"),
+        )
+
+    cache_key = None
+    if options.result_cache is not None and options.relevant_paths:
+        cache_key = get_cache_key(repo=repo, commit=commit, relevant_paths=options.relevant_paths)
+        build["reused_from"] = load_cached_results(
+            cache_dir=options.result_cache,
+            key=cache_key,
+            folder=Path("experiments"),
+        )
+
+    if build["reused_from"] is None:
+        install_commit(repo=repo, commit=commit, debug=options.debug)
+
+        # record the runner the commit is benchmarked on
+        fingerprint = get_fingerprint(exclude=get_editable_packages("watch_repo"))
+        save_fingerprint(folder=Path("experiments"), fingerprint=fingerprint)
+
+        # run the benchmarks, publishing the configs that succeeded
+        failures = run_benchmarks(
+            debug=options.debug,
+            repetitions=options.repetitions,
+            min_repetitions=options.min_repetitions,
+            target_ci=options.target_ci,
+            timeout=options.config_timeout,
+            retries=options.config_retries,
+            journal_path=build["journal_path"] and Path(build["journal_path"]),
+            profiler=options.profiler,
+        )
+        if failures and not parse_build(Path("experiments")):
+            raise RuntimeError("Benchmark failed!")
+
+        # a partial build isn't reused, later commits rerun its failed configs
+        if cache_key is not None and not failures:
+            save_cached_results(
+                cache_dir=options.result_cache,
+                key=cache_key,
+                build_id=build_id,
+                folder=Path("experiments"),
+            )
+    else:
+        print(f"Reusing the results of build {build['reused_from']} for build {build_id}")
+        if options.mark_reused:
+            build["build_subject"] += f" [results reused from build {build['reused_from']}]"
+
+    if staging:
+        staged_folder = STAGING_DIR / build_id
+        shutil.rmtree(staged_folder, ignore_errors=True)
+        staged_folder.parent.mkdir(parents=True, exist_ok=True)
+        os.replace("experiments", staged_folder)
+        build["folder"] = str(staged_folder)
+
+        # written last, a build is only resumed from the staging folder once it's complete
+        with open(STAGING_DIR / f".{build_id}.json.tmp", "w") as f:
+            json.dump(build, f, indent=2)
+        os.replace(STAGING_DIR / f".{build_id}.json.tmp", STAGING_DIR / f"{build_id}.json")
+
+    return build
+
+
+def load_staged_build(build_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns the build staged by `run_commit`, None if it isn't staged.
+    """
+    staged_info = STAGING_DIR / f"{build_id}.json"
+    if not staged_info.exists():
+        return None
+
+    return json.load(open(staged_info))
+
+
+def discard_staged_build(build_id: str) -> None:
+    """
+    Removes a staged build, its results and its checkpoint journal.
+    """
+    build = load_staged_build(build_id)
+    if build is not None and build["journal_path"]:
+        Path(build["journal_path"]).unlink(missing_ok=True)
+
+    shutil.rmtree(STAGING_DIR / build_id, ignore_errors=True)
+    (STAGING_DIR / f"{build_id}.json").unlink(missing_ok=True)
+
+
+def publish_commit(
+    build: Dict[str, Any],
+    url: str,
+    session: Session,
+    api_token: str,
+    dataset_id: str,
+    hf_token: str,
+    project_id: str,
+    options: RunOptions,
+    mirrors: Optional[List[Dict[str, Any]]] = None,
+) -> Optional[pd.DataFrame]:
+    """
+    Uploads and publishes a benchmarked build (see `run_commit`), then removes its results.
+    Returns its regression report (requires `options.store_path`).
+    """
+    folder = Path(build["folder"])
+    build_id = build["build_id"]
+    journal_path = Path(build["journal_path"]) if build["journal_path"] else None
+    stages = []
+    if journal_path is not None and journal_path.exists():
+        stages = load_journal(journal_path)["stages"]
+
+    build_infos = dict(
+        build_url=build["build_url"],
+        build_hash=build["build_hash"],
+        build_subject=build["build_subject"],
+        build_abbrev_hash=build["build_abbrev_hash"],
+        build_author_name=build["build_author_name"],
+        build_author_email=build["build_author_email"],
+    )
+
+    # upload the build
+    if "uploaded" not in stages:
+        upload_build(
+            folder=folder,
+            dataset_id=dataset_id,
+            hf_token=hf_token,
+            project_id=project_id,
+            build_id=build_id,
+            **build_infos,
+            reused_from=build["reused_from"],
+        )
+        if journal_path is not None:
+            record_stage(journal_path=journal_path, stage="uploaded")
+
+    # publish the build
+    report = publish_build(
+        folder=folder,
         url=url,
         session=session,
         api_token=api_token,
         project_id=project_id,
+        build_id=build_id,
+        **build_infos,
+        average_range=options.average_range,
+        average_min_count=options.average_min_count,
+        store_path=options.store_path,
+        max_workers=options.max_workers,
+        aggregation=options.aggregation,
+        mirrors=mirrors,
+        fingerprint_series=options.fingerprint_series,
+    )
+
+    if report is not None:
+        print(f"Build {build_id} ({build['build_abbrev_hash']}):")
+        print(format_regression_report(report))
+
+        if options.profiler is not None:
+            # a diagnostic, the build is published whether it succeeds or not
+            try:
+                diff_regressed_profiles(
+                    report=report,
+                    dataset_id=dataset_id,
+                    hf_token=hf_token,
+                    project_id=project_id,
+                    build_id=build_id,
+                    store_path=options.store_path,
+                    average_min_count=options.average_min_count,
+                    folder=folder,
+                )
+            except Exception:
+                print(f"Diffing the profiles of build {build_id} failed")
+                traceback.print_exc()
+
+    shutil.rmtree(folder)
+    if journal_path is not None:
+        journal_path.unlink(missing_ok=True)
+    if folder.parent == STAGING_DIR:
+        (STAGING_DIR / f"{build_id}.json").unlink(missing_ok=True)
+
+    return report
+
+
+def benchmark_commit(
+    repo: Repo,
+    commit: Commit,
+    url: str,
+    session: Session,
+    api_token: str,
+    dataset_id: str,
+    hf_token: str,
+    project_id: str,
+    watch_repo: str,
+    options: Optional[RunOptions] = None,
+    mirrors: Optional[List[Dict[str, Any]]] = None,
+    publisher: Optional[BackgroundPublisher] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[pd.DataFrame]]:
+    """
+    Installs, benchmarks, uploads and publishes a commit with the run `options` (see `RunOptions`).
+    The build is also published to the `mirrors` servers (see `mirrors.login_mirrors`).
+    With a `publisher`, the results are staged and uploaded and published in the background
+    while the next commit is benchmarked; the report is then in the publisher results.
+    Returns the published series and their regression report (requires `options.store_path`).
+    """
+    options = options or RunOptions()
+
+    build = run_commit(
+        repo=repo,
+        commit=commit,
+        project_id=project_id,
+        watch_repo=watch_repo,
+        options=options,
+        staging=publisher is not None,
     )
-    if not p_exists:
-        add_project(
+
+    series = parse_build(Path(build["folder"]), aggregation=options.aggregation)
+    fingerprint = load_fingerprint(Path(build["folder"]))
+    if options.fingerprint_series and fingerprint is not None:
+        series = namespace_series(series, get_fingerprint_class(fingerprint))
+
+    def publish() -> Optional[pd.DataFrame]:
+        return publish_commit(
+            build=build,
             url=url,
             session=session,
             api_token=api_token,
+            dataset_id=dataset_id,
+            hf_token=hf_token,
             project_id=project_id,
-            override=True,
+            options=options,
+            mirrors=mirrors,
         )
 
-    try:
-        repo = Repo.clone_from(watch_repo, "watch_repo")
-    except Exception:
-        repo = Repo("watch_repo")
+    if publisher is not None:
+        publisher.submit(build["build_id"], publish)
+        return series, None
 
-    commits = repo.iter_commits("main", max_count=num_commits)
+    return series, publish()
 
-    for commit in commits:
-        build_id = str(commit.count())
 
-        # check if build exists
-        b_exists = build_exists(
-            url=url,
-            session=session,
-            api_token=api_token,
-            project_id=project_id,
-            build_id=build_id,
+def update_project(
+    url: str,
+    session: Session,
+    api_token: str,
+    dataset_id: str,
+    hf_token: str,
+    project_id: str,
+    watch_repo: str,
+    num_commits: int = 10,
+    average_range: Optional[str] = None,
+    average_min_count: Optional[int] = None,
+    debug: Optional[bool] = None,
+    options: Optional[RunOptions] = None,
+    mirrors: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Updates a dana project that's monitoring a git repository.
+    `average_range`, `average_min_count` and `debug` are deprecated aliases of the `options` fields.
+    Returns the regression reports of the published builds (requires `options.store_path`).
+    """
+    options = options or RunOptions()
+    legacy = dict(average_range=average_range, average_min_count=average_min_count, debug=debug)
+    legacy = {name: value for name, value in legacy.items() if value is not None}
+    if legacy:
+        warnings.warn(
+            f"update_project({', '.join(legacy)}=...) is deprecated, use `options=RunOptions(...)`",
+            DeprecationWarning,
+            stacklevel=2,
         )
-        if b_exists:
-            continue
+        options = replace(options, **legacy)
+    reports = {}
+    publisher = BackgroundPublisher(max_pending=options.max_staged) if options.pipeline else None
+
+    mirrors = setup_project(
+        url=url,
+        session=session,
+        api_token=api_token,
+        project_id=project_id,
+        mirrors=mirrors,
+    )
+
+    repo = clone_watch_repo(watch_repo)
+
+    commits = repo.iter_commits("main", max_count=num_commits)
 
-        # get build info
-        build_hash = commit.hexsha
-        build_abbrev_hash = commit.hexsha[:7]
-        build_author_name = commit.author.name
-        build_author_email = commit.author.email
-        build_subject = commit.message
-        build_url = f"{watch_repo}/commit/{commit}"
-
-        repo.git.checkout(build_hash)
-        # run the install command and omit stdout (devnull)
-        out = subprocess.run(
-            ["pip", "install", "-e", "watch_repo"],
-            stdout=subprocess.DEVNULL if not debug else None,
-            stderr=subprocess.STDOUT if not debug else None,
-        )
-
-        if out.returncode != 0:
-            raise RuntimeError("Install failed!")
-
-        # run the benchmarks
-        for config_file in os.listdir("benchmarks"):
-            # get config name
-            config_name = os.path.splitext(config_file)[0]
-            # skip _base_
-            if config_name == "_base_":
+    try:
+        for commit in commits:
+            build_id = str(commit.count())
+
+            # check if build exists
+            b_exists = build_exists(
+                url=url,
+                session=session,
+                api_token=api_token,
+                project_id=project_id,
+                build_id=build_id,
+            )
+            if b_exists:
                 continue
 
-            # omit stdout (devnull)
-            out = subprocess.run(
-                [
-                    "optimum-benchmark",
-                    "--config-dir",
-                    "benchmarks",
-                    "--config-name",
-                    config_name,
-                    "--multirun",
-                ],
-                stdout=subprocess.DEVNULL if not debug else None,
-                stderr=subprocess.STDOUT if not debug else None,
+            _, report = benchmark_commit(
+                repo=repo,
+                commit=commit,
+                url=url,
+                session=session,
+                api_token=api_token,
+                dataset_id=dataset_id,
+                hf_token=hf_token,
+                project_id=project_id,
+                watch_repo=watch_repo,
+                options=options,
+                mirrors=mirrors,
+                publisher=publisher,
             )
 
-            if out.returncode != 0:
-                raise RuntimeError("Benchmark failed!")
+            if report is not None:
+                reports[build_id] = report
+    finally:
+        # the builds benchmarked before a failure are still published
+        if publisher is not None:
+            for build_id, report in publisher.join().items():
+                if report is not None:
+                    reports[build_id] = report
 
-        # upload the build
-        upload_build(
-            folder=Path("experiments"),
-            dataset_id=dataset_id,
-            hf_token=hf_token,
-            project_id=project_id,
-            build_id=build_id,
-            build_url=build_url,
-            build_hash=build_hash,
-            build_subject=build_subject,
-            build_abbrev_hash=build_abbrev_hash,
-            build_author_name=build_author_name,
-            build_author_email=build_author_email,
+    return reports
+
+
+def queue_commits(
+    queue: List[Tuple[int, str]],
+    new_commits: List[Tuple[int, str]],
+    skip_intermediate: bool = False,
+) -> List[Tuple[int, str]]:
+    """
+    Adds the (commit count, hexsha) of newly fetched commits to the watch queue, a heap from which
+    `heapq.heappop` returns the newest commit first. With `skip_intermediate`, the queued commits
+    are dropped when new ones were fetched.
+    """
+    if new_commits and skip_intermediate:
+        queue = []
+    for count, hexsha in new_commits:
+        heapq.heappush(queue, (-count, hexsha))
+
+    return queue
+
+
+def watch_project(
+    url: str,
+    session: Session,
+    api_token: str,
+    dataset_id: str,
+    hf_token: str,
+    project_id: str,
+    watch_repo: str,
+    num_commits: int = 10,
+    interval: float = 300,
+    skip_intermediate: bool = False,
+    options: Optional[RunOptions] = None,
+    mirrors: Optional[List[Dict[str, Any]]] = None,
+) -> None:
+    """
+    Keeps a dana project up to date with a git repository, benchmarking the newest commits first.
+    The repository is fetched every `interval` seconds when idle and after every benchmarked commit,
+    so that a new commit is benchmarked next. With `skip_intermediate`, queued commits older than
+    a newly fetched one are dropped instead of being benchmarked later.
+    The clone, installed environment and session are reused across iterations.
+    """
+    options = options or RunOptions()
+    publisher = BackgroundPublisher(max_pending=options.max_staged) if options.pipeline else None
+
+    mirrors = setup_project(
+        url=url,
+        session=session,
+        api_token=api_token,
+        project_id=project_id,
+        mirrors=mirrors,
+    )
+
+    repo = clone_watch_repo(watch_repo)
+
+    # heap of (-commit count, hexsha), newest commit first
+    queue = []
+    seen = set()
+
+    while True:
+        if publisher is not None:
+            # a build that failed to publish isn't retried, like a commit that failed to benchmark,
+            # the builds skipped after it are queued again (and resumed from their staged results),
+            # unless intermediate commits are skipped, so that staged builds don't pile up
+            failed, skipped = publisher.pop_dropped()
+            if skip_intermediate:
+                failed, skipped = failed + skipped, []
+            for build_id in failed:
+                discard_staged_build(build_id)
+            staged_builds = [load_staged_build(build_id) for build_id in skipped]
+            queue = queue_commits(
+                queue=queue,
+                new_commits=[(int(b["build_id"]), b["build_hash"]) for b in staged_builds if b],
+            )
+
+        # an unreachable remote or server doesn't stop benchmarking the commits already queued
+        try:
+            repo.remotes.origin.fetch()
+        except Exception as e:
+            print(f"Fetching {watch_repo} failed, retrying on the next interval: {e!r}")
+
+        new_commits = []
+        for commit in repo.iter_commits("origin/main", max_count=num_commits):
+            if commit.hexsha in seen:
+                continue
+
+            try:
+                b_exists = build_exists(
+                    url=url,
+                    session=session,
+                    api_token=api_token,
+                    project_id=project_id,
+                    build_id=str(commit.count()),
+                )
+            except Exception as e:
+                # checked again on the next interval
+                print(f"Checking {commit.hexsha[:7]} failed: {e!r}")
+                continue
+            if not b_exists:
+                new_commits.append((commit.count(), commit.hexsha))
+            seen.add(commit.hexsha)
+
+        queue = queue_commits(
+            queue=queue, new_commits=new_commits, skip_intermediate=skip_intermediate
         )
 
-        # publish the build
-        publish_build(
-            folder=Path("experiments"),
+        if not queue:
+            time.sleep(interval)
+            continue
+
+        _, hexsha = heapq.heappop(queue)
+        commit = repo.commit(hexsha)
+        print(f"Benchmarking {hexsha[:7]} ({len(queue)} commits queued)")
+
+        try:
+            benchmark_commit(
+                repo=repo,
+                commit=commit,
+                url=url,
+                session=session,
+                api_token=api_token,
+                dataset_id=dataset_id,
+                hf_token=hf_token,
+                project_id=project_id,
+                watch_repo=watch_repo,
+                options=options,
+                mirrors=mirrors,
+                publisher=publisher,
+            )
+        except Exception:
+            # keep watching, the commit is not retried
+            traceback.print_exc()
+            shutil.rmtree("experiments", ignore_errors=True)
+
+
+def bisect_project(
+    url: str,
+    session: Session,
+    api_token: str,
+    dataset_id: str,
+    hf_token: str,
+    project_id: str,
+    watch_repo: str,
+    num_commits: int = 10,
+    num_samples: int = 2,
+    options: Optional[RunOptions] = None,
+    mirrors: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Dict[str, float]]:
+    """
+    Locates the commits that moved series by more than `options.average_range` in the last
+    `num_commits`. The window endpoints and `num_samples` evenly spaced commits are benchmarked
+    first, then only the midpoints of the intervals where a series moved, until the culprit
+    commits are isolated. Commits already in the local store (`options.store_path`) are not
+    benchmarked again.
+    Returns the relative change of the moved series for each culprit commit.
+    """
+    options = options or RunOptions()
+
+    mirrors = setup_project(
+        url=url,
+        session=session,
+        api_token=api_token,
+        project_id=project_id,
+        mirrors=mirrors,
+    )
+
+    repo = clone_watch_repo(watch_repo)
+
+    # oldest first
+    commits = list(repo.iter_commits("main", max_count=num_commits))[::-1]
+    publisher = BackgroundPublisher(max_pending=options.max_staged) if options.pipeline else None
+
+    measured = []
+
+    def measure(index: int) -> Dict[str, float]:
+        measured.append(index)
+        commit = commits[index]
+        build_id = str(commit.count())
+
+        if options.store_path is not None:
+            connection = connect_store(options.store_path)
+            build_samples = get_build_samples(
+                connection=connection,
+                project_id=project_id,
+                build_id=build_id,
+            )
+            connection.close()
+            if not build_samples.empty:
+                return dict(zip(build_samples["series_id"], build_samples["sample_value"]))
+
+        series, _ = benchmark_commit(
+            repo=repo,
+            commit=commit,
             url=url,
             session=session,
             api_token=api_token,
+            dataset_id=dataset_id,
+            hf_token=hf_token,
             project_id=project_id,
-            build_id=build_id,
-            build_url=build_url,
-            build_hash=build_hash,
-            build_subject=build_subject,
-            build_abbrev_hash=build_abbrev_hash,
-            build_author_name=build_author_name,
-            build_author_email=build_author_email,
-            average_range=average_range,
-            average_min_count=average_min_count,
+            watch_repo=watch_repo,
+            options=options,
+            mirrors=mirrors,
+            publisher=publisher,
         )
+        # the dispersion of the runs isn't bisected
+        return {s["series_id"]: s["sample_value"] for s in series if not s.get("companion")}
+
+    try:
+        culprits = bisect_shifts(
+            num_commits=len(commits),
+            measure=measure,
+            num_samples=num_samples,
+            benchmark_range=options.average_range,
+        )
+    finally:
+        # the builds benchmarked before a failure are still published
+        if publisher is not None:
+            publisher.join()
+
+    for index, shifts in culprits.items():
+        print(f"Commit {commits[index].hexsha[:7]} moved {len(shifts)} series:")
+        for series_id, delta in shifts.items():
+            print(f"  {series_id}: {delta * 100:+.2f}%")
+    print(f"Bisected {len(commits)} commits with {len(measured)} builds")
 
-        shutil.rmtree("experiments")
+    return {commits[index].hexsha: shifts for index, shifts in culprits.items()}
 
 
 def main():
@@ -155,6 +1081,32 @@ def main():
     parser.add_argument("--average-range", type=str, default="5%")
     parser.add_argument("--average-min-count", type=int, default=3)
     parser.add_argument("--debug", action="store_true", default=False)
+    parser.add_argument("--store", type=str, default=None)
+    parser.add_argument("--compress", action="store_true", default=False)
+    parser.add_argument("--session-cache", type=str, default=None)
+    parser.add_argument("--serializer", type=str, default="auto")
+    parser.add_argument("--max-concurrency", type=int, default=1)
+    parser.add_argument("--rate-limit", type=str, action="append", default=None)
+    parser.add_argument("--fail-on-regression", action="store_true", default=False)
+    parser.add_argument("--bisect", action="store_true", default=False)
+    parser.add_argument("--bisect-samples", type=int, default=2)
+    parser.add_argument("--watch-interval", type=float, default=None)
+    parser.add_argument("--skip-intermediate", action="store_true", default=False)
+    parser.add_argument("--result-cache", type=str, default=None)
+    parser.add_argument("--relevant-path", type=str, action="append", default=None)
+    parser.add_argument("--mark-reused", action="store_true", default=False)
+    parser.add_argument("--repetitions", type=int, default=1)
+    parser.add_argument("--min-repetitions", type=int, default=3)
+    parser.add_argument("--target-ci", type=float, default=None)
+    parser.add_argument("--aggregation", type=str, default="median")
+    parser.add_argument("--config-timeout", type=float, default=None)
+    parser.add_argument("--config-retries", type=int, default=0)
+    parser.add_argument("--checkpoint-dir", type=str, default=None)
+    parser.add_argument("--mirror", type=str, action="append", default=None)
+    parser.add_argument("--fingerprint-series", action="store_true", default=False)
+    parser.add_argument("--profiler", type=str, choices=PROFILERS, default=None)
+    parser.add_argument("--pipeline", action="store_true", default=False)
+    parser.add_argument("--max-staged", type=int, default=1)
 
     args = parser.parse_args()
 
@@ -163,32 +1115,120 @@ def main():
     project_id = args.project_id
     watch_repo = args.watch_repo
     num_commits = args.num_commits
-    average_range = args.average_range
-    average_min_count = args.average_min_count
-    debug = args.debug
+    fail_on_regression = args.fail_on_regression
+
+    options = RunOptions(
+        average_range=args.average_range,
+        average_min_count=args.average_min_count,
+        debug=args.debug,
+        store_path=Path(args.store) if args.store else None,
+        max_workers=args.max_concurrency,
+        result_cache=Path(args.result_cache) if args.result_cache else None,
+        relevant_paths=args.relevant_path,
+        mark_reused=args.mark_reused,
+        repetitions=args.repetitions,
+        min_repetitions=args.min_repetitions,
+        target_ci=args.target_ci,
+        aggregation=args.aggregation,
+        config_timeout=args.config_timeout,
+        config_retries=args.config_retries,
+        checkpoint_dir=Path(args.checkpoint_dir) if args.checkpoint_dir else None,
+        fingerprint_series=args.fingerprint_series,
+        profiler=args.profiler,
+        pipeline=args.pipeline,
+        max_staged=args.max_staged,
+    )
+
+    if fail_on_regression and options.store_path is None:
+        parser.error("--fail-on-regression requires --store")
+    if fail_on_regression and (args.bisect or args.watch_interval is not None):
+        parser.error("--fail-on-regression can't be used with --bisect or --watch-interval")
+    if options.max_staged < 1:
+        parser.error("--max-staged must be at least 1")
+    if options.profiler == "py-spy" and shutil.which("py-spy") is None:
+        parser.error("--profiler py-spy requires py-spy to be installed (pip install py-spy)")
 
     HF_TOKEN = os.environ.get("HF_TOKEN", None)
     API_TOKEN = os.environ.get("API_TOKEN", None)
     ADMIN_USERNAME = os.environ.get("ADMIN_USERNAME", "admin")
     ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "admin")
 
+    configure(serializer=args.serializer, compress=args.compress)
+
     session = login(
         url=url,
         api_token=API_TOKEN,
         username=ADMIN_USERNAME,
         password=ADMIN_PASSWORD,
+        cache_path=Path(args.session_cache) if args.session_cache else None,
     )
 
-    update_project(
-        url=url,
-        session=session,
+    max_workers = args.max_concurrency
+    if max_workers > 1 or args.rate_limit:
+        session.dana_limiter = AdaptiveLimiter(
+            max_limit=max_workers,
+            rate_limits=parse_rate_limits(args.rate_limit),
+        )
+
+    mirrors = login_mirrors(
+        specs=args.mirror,
         api_token=API_TOKEN,
-        dataset_id=dataset_id,
-        hf_token=HF_TOKEN,
-        project_id=project_id,
-        watch_repo=watch_repo,
-        num_commits=num_commits,
-        average_range=average_range,
-        average_min_count=average_min_count,
-        debug=debug,
+        username=ADMIN_USERNAME,
+        password=ADMIN_PASSWORD,
+        cache_path=Path(args.session_cache) if args.session_cache else None,
+        max_workers=max_workers,
+        rate_limits=parse_rate_limits(args.rate_limit),
     )
+
+    reports = {}
+    if args.watch_interval is not None:
+        watch_project(
+            url=url,
+            session=session,
+            api_token=API_TOKEN,
+            dataset_id=dataset_id,
+            hf_token=HF_TOKEN,
+            project_id=project_id,
+            watch_repo=watch_repo,
+            num_commits=num_commits,
+            interval=args.watch_interval,
+            skip_intermediate=args.skip_intermediate,
+            options=options,
+            mirrors=mirrors,
+        )
+    elif args.bisect:
+        bisect_project(
+            url=url,
+            session=session,
+            api_token=API_TOKEN,
+            dataset_id=dataset_id,
+            hf_token=HF_TOKEN,
+            project_id=project_id,
+            watch_repo=watch_repo,
+            num_commits=num_commits,
+            num_samples=args.bisect_samples,
+            options=options,
+            mirrors=mirrors,
+        )
+    else:
+        reports = update_project(
+            url=url,
+            session=session,
+            api_token=API_TOKEN,
+            dataset_id=dataset_id,
+            hf_token=HF_TOKEN,
+            project_id=project_id,
+            watch_repo=watch_repo,
+            num_commits=num_commits,
+            options=options,
+            mirrors=mirrors,
+        )
+
+    print(format_stats(get_stats()))
+    if getattr(session, "dana_limiter", None) is not None:
+        print(format_limiter_summary(session.dana_limiter.summary()))
+    if mirrors:
+        print(format_targets_report(get_targets_report()))
+
+    if fail_on_regression and any(has_regressions(report) for report in reports.values()):
+        sys.exit(1)
@@ -6,17 +6,27 @@ INSTALL_REQUIRES = [
     "GitPython",
     "omegaconf",
     "pandas",
+    "numpy",
 ]
 
+EXTRAS_REQUIRE = {
+    "orjson": ["orjson"],
+    "export": ["pyarrow"],
+}
+
 setup(
     name="dana-client",
     version="0.0.1",
     packages=find_packages(),
     install_requires=INSTALL_REQUIRES,
+    extras_require=EXTRAS_REQUIRE,
     entry_points={
         "console_scripts": [
             "publish-backup=dana_client.publish_backup:main",
             "update-project=dana_client.update_project:main",
+            "dana-store=dana_client.store:main",
+            "dana-export=dana_client.export:main",
+            "dana-loadgen=dana_client.loadgen:main",
         ],
     },
 )
@@ -11,6 +11,8 @@ from dana_client.api import (
     add_sample,
     project_exists,
     build_exists,
+    get_series,
+    get_series_samples,
 )
 
 URL = "http://localhost:7000"
@@ -48,6 +50,38 @@ def test_login_wrong_credentials():
         )
 
 
+def test_login_session_cache(tmp_path):
+    cache_path = tmp_path / "session.json"
+
+    session = login(
+        url=URL,
+        api_token=API_TOKEN,
+        username=ADMIN_USERNAME,
+        password=ADMIN_PASSWORD,
+        cache_path=cache_path,
+    )
+    assert cache_path.exists()
+    assert cache_path.stat().st_mode & 0o777 == 0o600
+
+    cached_session = login(
+        url=URL,
+        api_token=API_TOKEN,
+        username=ADMIN_USERNAME,
+        password=ADMIN_PASSWORD,
+        cache_path=cache_path,
+    )
+    assert dict(cached_session.cookies) == dict(session.cookies)
+
+    add_project(
+        url=URL,
+        session=cached_session,
+        api_token=API_TOKEN,
+        project_id=PROJECT_ID,
+        project_description="",
+        override=True,
+    )
+
+
 def test_add_project():
     session = login(
         url=URL,
@@ -281,3 +315,77 @@ def test_build_exists():
         )
         is False
     )
+
+
+def test_get_series():
+    session = login(
+        url=URL,
+        api_token=API_TOKEN,
+        username=ADMIN_USERNAME,
+        password=ADMIN_PASSWORD,
+    )
+
+    add_project(
+        url=URL,
+        session=session,
+        api_token=API_TOKEN,
+        project_id=PROJECT_ID,
+        project_description="",
+        override=True,
+    )
+
+    add_series(
+        url=URL,
+        session=session,
+        api_token=API_TOKEN,
+        project_id=PROJECT_ID,
+        series_id=SERIES_ID,
+        series_unit="tokens",
+        series_description="",
+        benchmark_range="5%",
+        benchmark_required=3,
+        benchmark_trend="higher",
+        override=True,
+    )
+
+    add_build(
+        url=URL,
+        session=session,
+        api_token=API_TOKEN,
+        project_id=PROJECT_ID,
+        build_id=1,
+        override=True,
+    )
+
+    add_sample(
+        url=URL,
+        session=session,
+        api_token=API_TOKEN,
+        project_id=PROJECT_ID,
+        series_id=SERIES_ID,
+        build_id=1,
+        sample_value=1000,
+        sample_unit="tokens",
+        override=True,
+    )
+
+    series = get_series(
+        url=URL,
+        session=session,
+        api_token=API_TOKEN,
+        project_id=PROJECT_ID,
+        series_id=SERIES_ID,
+    )
+    assert series is not None
+    assert get_series_samples(series)["1"] == 1000
+
+    assert (
+        get_series(
+            url=URL,
+            session=session,
+            api_token=API_TOKEN,
+            project_id=PROJECT_ID,
+            series_id="not-test-series",
+        )
+        is None
+    )
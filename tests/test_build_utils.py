@@ -4,7 +4,8 @@ from pathlib import Path
 import pytest
 
 from dana_client.api import login, build_exists
-from dana_client.build_utils import publish_build, upload_build
+from dana_client.build_utils import publish_build, upload_build, parse_build
+from dana_client.sync import diff_build
 
 FOLDER = Path("experiments")
 URL = "http://localhost:7000"
@@ -78,3 +79,41 @@ def test_publish_build_wrong_token():
             average_range="5%",
             average_min_count=3,
         )
+
+
+def test_publish_build_sync():
+    session = login(
+        url=URL,
+        api_token=API_TOKEN,
+        username=ADMIN_USERNAME,
+        password=ADMIN_PASSWORD,
+    )
+
+    publish_build(
+        url=URL,
+        session=session,
+        api_token=API_TOKEN,
+        folder=FOLDER,
+        project_id=PROJECT_ID,
+        build_id=BUILD_ID,
+        average_range="5%",
+        average_min_count=3,
+        sync=True,
+    )
+
+    plan = diff_build(
+        url=URL,
+        session=session,
+        api_token=API_TOKEN,
+        project_id=PROJECT_ID,
+        build_id=BUILD_ID,
+        series=parse_build(FOLDER),
+        average_range="5%",
+        average_min_count=3,
+        max_workers=4,
+    )
+
+    assert not plan["add_project"]
+    assert not plan["add_build"]
+    assert plan["add_series"] == []
+    assert plan["add_sample"] == []
@@ -0,0 +1,81 @@
+from dana_client.checkpoint import (
+    get_journal_path,
+    load_journal,
+    record_config,
+    record_stage,
+    start_journal,
+)
+
+PROJECT_ID = "test-checkpoint-project"
+BUILD_ID = "42"
+BUILD_HASH = "0123456789abcdef"
+
+
+def test_resume_journal(tmp_path):
+    folder = tmp_path / "experiments"
+    journal_path = get_journal_path(
+        checkpoint_dir=tmp_path / "checkpoints",
+        project_id=PROJECT_ID,
+        build_id=BUILD_ID,
+    )
+
+    journal = start_journal(journal_path=journal_path, build_hash=BUILD_HASH, folder=folder)
+    assert journal["configs"] == {}
+
+    (folder / "bert").mkdir(parents=True)
+    record_config(journal_path=journal_path, config_name="bert", artifacts=["bert"])
+    record_stage(journal_path=journal_path, stage="uploaded")
+    # interrupted while running the next config
+    (folder / "gpt2").mkdir()
+
+    journal = start_journal(journal_path=journal_path, build_hash=BUILD_HASH, folder=folder)
+    assert journal["configs"] == {"bert": {"artifacts": ["bert"], "failure": None}}
+    assert journal["stages"] == ["uploaded"]
+    assert sorted(p.name for p in folder.iterdir()) == ["bert"]
+
+
+def test_retry_failed_configs(tmp_path):
+    folder = tmp_path / "experiments"
+    journal_path = get_journal_path(
+        checkpoint_dir=tmp_path / "checkpoints",
+        project_id=PROJECT_ID,
+        build_id=BUILD_ID,
+    )
+
+    start_journal(journal_path=journal_path, build_hash=BUILD_HASH, folder=folder)
+    (folder / "bert").mkdir(parents=True)
+    record_config(journal_path=journal_path, config_name="bert", artifacts=["bert"])
+    (folder / "gpt2").mkdir()
+    failure = {"config_name": "gpt2", "repetition": 0, "attempts": 1, "timed_out": True}
+    record_config(
+        journal_path=journal_path, config_name="gpt2", artifacts=["gpt2"], failure=failure
+    )
+
+    # the failed config is rerun on resume
+    journal = start_journal(journal_path=journal_path, build_hash=BUILD_HASH, folder=folder)
+    assert list(journal["configs"]) == ["bert"]
+    assert sorted(p.name for p in folder.iterdir()) == ["bert"]
+
+    # but not once the build was uploaded with its failures
+    record_config(journal_path=journal_path, config_name="gpt2", artifacts=[], failure=failure)
+    record_stage(journal_path=journal_path, stage="uploaded")
+    journal = start_journal(journal_path=journal_path, build_hash=BUILD_HASH, folder=folder)
+    assert sorted(journal["configs"]) == ["bert", "gpt2"]
+
+
+def test_restart_journal_on_other_commit(tmp_path):
+    folder = tmp_path / "experiments"
+    journal_path = get_journal_path(
+        checkpoint_dir=tmp_path / "checkpoints",
+        project_id=PROJECT_ID,
+        build_id=BUILD_ID,
+    )
+
+    start_journal(journal_path=journal_path, build_hash=BUILD_HASH, folder=folder)
+    (folder / "bert").mkdir(parents=True)
+    record_config(journal_path=journal_path, config_name="bert", artifacts=["bert"])
+
+    journal = start_journal(journal_path=journal_path, build_hash="fedcba9876543210", folder=folder)
+    assert journal["configs"] == {}
+    assert not folder.exists()
+    assert load_journal(journal_path)["build_hash"] == "fedcba9876543210"
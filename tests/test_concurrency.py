@@ -0,0 +1,54 @@
+import time
+
+from dana_client.concurrency import AdaptiveLimiter, TokenBucket, parse_rate_limits
+
+MAX_LIMIT = 8
+
+
+def test_limiter_increases_on_success():
+    limiter = AdaptiveLimiter(max_limit=MAX_LIMIT, initial_limit=1)
+
+    for _ in range(100):
+        limiter.record(latency=0.01, status_code=200)
+
+    summary = limiter.summary()
+    assert summary["limit"] == MAX_LIMIT
+    assert summary["peak_limit"] == MAX_LIMIT
+    assert summary["decreases"] == 0
+
+
+def test_limiter_backs_off_on_throttling():
+    limiter = AdaptiveLimiter(max_limit=MAX_LIMIT, initial_limit=MAX_LIMIT)
+
+    limiter.record(latency=0.01, status_code=200)
+    limiter.record(latency=0.01, status_code=503)
+    assert limiter.summary()["limit"] == MAX_LIMIT // 2
+
+    # requests that were in flight during the same round trip don't decrease the limit again
+    limiter.record(latency=0.01, status_code=429)
+    assert limiter.summary()["limit"] == MAX_LIMIT // 2
+
+    time.sleep(0.1)
+    limiter.record(latency=0.05, status_code=200)
+    summary = limiter.summary()
+    assert summary["limit"] == MAX_LIMIT // 4
+    assert summary["throttled"] == 2
+    assert summary["slow"] == 1
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=100, burst=1)
+
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+
+    assert time.monotonic() - start >= 0.03
+
+
+def test_parse_rate_limits():
+    assert parse_rate_limits(["/apis/addSample=50", "/apis/addSerie=2.5"]) == {
+        "/apis/addSample": 50.0,
+        "/apis/addSerie": 2.5,
+    }
+    assert parse_rate_limits(None) == {}
@@ -0,0 +1,94 @@
+import gzip
+import json
+
+import pytest
+from requests import Response
+
+from dana_client.api import SERIALIZERS, configure, get_stats, post, reset_stats
+
+URL = "http://localhost:7000/apis/addSample"
+PAYLOAD = {"projectId": "test-encoding-project", "values": list(range(1000))}
+
+
+class FakeSession:
+    def __init__(self, status_codes):
+        self.status_codes = list(status_codes)
+        self.requests = []
+
+    def request(self, method, url, data, headers):
+        self.requests.append({"method": method, "data": data, "headers": dict(headers)})
+        response = Response()
+        response.status_code = self.status_codes.pop(0) if self.status_codes else 200
+        response.url = url
+        return response
+
+
+@pytest.fixture(autouse=True)
+def reset_config():
+    reset_stats()
+    yield
+    configure(serializer="json", compress=False)
+
+
+def test_gzip_body():
+    configure(serializer="json", compress=True, compress_min_size=16)
+    session = FakeSession([200])
+
+    post(session=session, url=URL, api_token="token", payload=PAYLOAD)
+
+    sent = session.requests[0]
+    assert sent["headers"]["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(sent["data"])) == PAYLOAD
+
+
+def test_small_body_not_compressed():
+    configure(serializer="json", compress=True, compress_min_size=1024)
+    session = FakeSession([200])
+
+    post(session=session, url=URL, api_token="token", payload={"projectId": "p"})
+
+    sent = session.requests[0]
+    assert "Content-Encoding" not in sent["headers"]
+    assert json.loads(sent["data"]) == {"projectId": "p"}
+
+
+def test_unsupported_encoding_fallback():
+    configure(serializer="json", compress=True, compress_min_size=16)
+    session = FakeSession([415, 200, 200])
+
+    post(session=session, url=URL, api_token="token", payload=PAYLOAD)
+    post(session=session, url=URL, api_token="token", payload=PAYLOAD)
+
+    # retried uncompressed, and compression stays off for the next requests
+    assert [r["headers"].get("Content-Encoding") for r in session.requests] == ["gzip", None, None]
+    assert json.loads(session.requests[1]["data"]) == PAYLOAD
+
+
+@pytest.mark.parametrize("serializer", sorted(SERIALIZERS))
+def test_serializers(serializer):
+    configure(serializer=serializer)
+    session = FakeSession([200])
+
+    post(session=session, url=URL, api_token="token", payload=PAYLOAD)
+
+    assert json.loads(session.requests[0]["data"]) == PAYLOAD
+
+
+def test_unknown_serializer():
+    with pytest.raises(ValueError):
+        configure(serializer="pickle")
+
+
+def test_stats():
+    configure(serializer="json", compress=True, compress_min_size=16)
+    session = FakeSession([200, 200])
+
+    post(session=session, url=URL, api_token="token", payload=PAYLOAD)
+    post(session=session, url=URL, api_token="token", payload={"projectId": "p"})
+
+    stats = get_stats()
+    payload_bytes = len(SERIALIZERS["json"](PAYLOAD)) + len(SERIALIZERS["json"]({"projectId": "p"}))
+    assert stats["requests"] == 2
+    assert stats["payload_bytes"] == payload_bytes
+    assert stats["wire_bytes"] == sum(len(r["data"]) for r in session.requests)
+    assert stats["wire_bytes"] < stats["payload_bytes"]
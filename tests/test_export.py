@@ -0,0 +1,86 @@
+import pytest
+import pyarrow.dataset as ds
+
+import dana_client.export as export
+
+PROJECT_ID = "test-export-project"
+NUM_BUILDS = 5
+NUM_SERIES = 7
+
+
+def fake_get_builds(url, session, api_token, project_id, start=0, count=100):
+    build_ids = range(1, NUM_BUILDS + 1)[start : start + count]
+    return [{"buildId": build_id, "infos": {"hash": f"hash-{build_id}"}} for build_id in build_ids]
+
+
+def fake_get_series_ids(url, session, api_token, project_id, start=0, count=100):
+    return [f"series-{i}" for i in range(NUM_SERIES)][start : start + count]
+
+
+def fake_get_series(url, session, api_token, project_id, series_id):
+    return {"samples": {str(b): float(b) for b in range(1, NUM_BUILDS + 1)}}
+
+
+def read_table(output_dir, table):
+    return ds.dataset(output_dir / table, format="parquet", partitioning="hive").to_table()
+
+
+def test_export_project(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "get_builds", fake_get_builds)
+    monkeypatch.setattr(export, "get_series_ids", fake_get_series_ids)
+    monkeypatch.setattr(export, "get_series", fake_get_series)
+
+    last_build = export.export_project(
+        url="",
+        session=None,
+        api_token="",
+        project_id=PROJECT_ID,
+        output_dir=tmp_path,
+        since_build=None,
+        page_size=2,
+        max_workers=2,
+    )
+    assert last_build == NUM_BUILDS
+
+    builds = read_table(tmp_path, "builds")
+    samples = read_table(tmp_path, "samples")
+    assert sorted(builds["build_id"].to_pylist()) == list(range(1, NUM_BUILDS + 1))
+    assert builds["build_hash"].to_pylist()[0] == "hash-1"
+    assert samples.num_rows == NUM_BUILDS * NUM_SERIES
+    assert set(samples["project_id"].to_pylist()) == {PROJECT_ID}
+
+    # incremental export of the last two builds
+    export.export_project(
+        url="",
+        session=None,
+        api_token="",
+        project_id=PROJECT_ID,
+        output_dir=tmp_path,
+        since_build=NUM_BUILDS - 2,
+        page_size=2,
+    )
+    assert read_table(tmp_path, "samples").num_rows == (NUM_BUILDS + 2) * NUM_SERIES
+
+
+def test_failed_export_keeps_previous(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "get_builds", fake_get_builds)
+    monkeypatch.setattr(export, "get_series_ids", fake_get_series_ids)
+    monkeypatch.setattr(export, "get_series", fake_get_series)
+
+    kwargs = dict(url="", session=None, api_token="", project_id=PROJECT_ID, output_dir=tmp_path)
+    export.export_project(**kwargs, since_build=None)
+
+    def failing_get_series(url, session, api_token, project_id, series_id):
+        raise ConnectionError("server went away")
+
+    monkeypatch.setattr(export, "get_series", failing_get_series)
+
+    # the samples fail after the builds were fetched, neither part is added
+    for since_build in [None, NUM_BUILDS - 2]:
+        with pytest.raises(ConnectionError):
+            export.export_project(**kwargs, since_build=since_build)
+
+        assert read_table(tmp_path, "builds").num_rows == NUM_BUILDS
+        assert read_table(tmp_path, "samples").num_rows == NUM_BUILDS * NUM_SERIES
+        for table in export.TABLES:
+            assert len(list((tmp_path / table / f"project_id={PROJECT_ID}").iterdir())) == 1
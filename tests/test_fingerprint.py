@@ -0,0 +1,45 @@
+from pathlib import Path
+
+from dana_client.fingerprint import (
+    get_editable_packages,
+    get_fingerprint,
+    get_fingerprint_class,
+    load_fingerprint,
+    namespace_series,
+    save_fingerprint,
+)
+
+
+def test_fingerprint(tmp_path):
+    fingerprint = get_fingerprint(packages=["numpy", "not-installed-package"])
+
+    assert fingerprint["cpu_count"] > 0
+    assert fingerprint["cpu_model"]
+    assert list(fingerprint["packages"]) == ["numpy"]
+
+    assert load_fingerprint(tmp_path) is None
+    save_fingerprint(folder=tmp_path, fingerprint=fingerprint)
+    assert load_fingerprint(tmp_path) == fingerprint
+
+
+def test_fingerprint_class():
+    fingerprint = get_fingerprint(packages=["numpy"])
+    other_runner = {**fingerprint, "cpu_count": fingerprint["cpu_count"] + 1}
+
+    assert get_fingerprint_class(fingerprint) == get_fingerprint_class(dict(fingerprint))
+    assert get_fingerprint_class(fingerprint) != get_fingerprint_class(other_runner)
+
+    series = [{"series_id": "gpt2_latency(ms)", "sample_value": 1.0}]
+    namespaced = namespace_series(series, get_fingerprint_class(fingerprint))
+    assert namespaced[0]["series_id"] == f"gpt2_latency(ms)@{get_fingerprint_class(fingerprint)}"
+    assert series[0]["series_id"] == "gpt2_latency(ms)"
+
+
+def test_fingerprint_excludes_watched_package():
+    # the package is installed in editable mode from the repository root, like the watched one
+    watched = get_editable_packages(Path(__file__).parent.parent)
+    assert watched == ["dana-client"]
+
+    fingerprint = get_fingerprint(packages=["numpy", "dana_client"], exclude=watched)
+    assert list(fingerprint["packages"]) == ["numpy"]
+    assert get_fingerprint(packages=["numpy"], exclude=["NumPy"])["packages"] == {}
@@ -0,0 +1,27 @@
+from dana_client.loadgen import run_load
+
+URL = "http://localhost:7000"
+API_TOKEN = "api-token"
+ADMIN_USERNAME = "admin"
+ADMIN_PASSWORD = "admin"
+
+
+def test_run_load():
+    summary, wall_time = run_load(
+        url=URL,
+        api_token=API_TOKEN,
+        username=ADMIN_USERNAME,
+        password=ADMIN_PASSWORD,
+        num_projects=2,
+        num_builds=3,
+        num_series=5,
+        concurrency=2,
+        project_prefix="test-loadgen-project",
+    )
+
+    assert wall_time > 0
+    assert summary["/login"]["requests"] == 2
+    assert summary["/apis/addBuild"]["requests"] == 2 * 3
+    assert summary["/apis/addSample"]["requests"] == 2 * 3 * 5
+    assert all(stats["errors"] == 0 for stats in summary.values())
+    assert all(stats["p50"] <= stats["p95"] <= stats["p99"] for stats in summary.values())
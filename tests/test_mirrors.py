@@ -0,0 +1,72 @@
+import pytest
+
+from dana_client.mirrors import (
+    get_targets_report,
+    login_mirrors,
+    parse_mirror,
+    publish_to_targets,
+    setup_mirrors,
+)
+
+TARGETS = [
+    {"url": "http://production", "session": None, "api_token": ""},
+    {"url": "http://staging", "session": None, "api_token": ""},
+]
+
+
+def test_parse_mirror():
+    assert parse_mirror("http://staging") == ("http://staging", None)
+    assert parse_mirror("http://staging=STAGING") == ("http://staging", "STAGING")
+
+
+def test_publish_to_targets_isolation():
+    published = []
+
+    def publish(target):
+        if target["url"] == "http://staging":
+            raise ConnectionError("staging is down")
+        published.append(target["url"])
+
+    errors = publish_to_targets(targets=TARGETS, publish=publish, label="build 1 of test")
+
+    assert published == ["http://production"]
+    assert errors["http://production"] is None
+    assert "staging is down" in errors["http://staging"]
+
+    report = get_targets_report()
+    assert report["http://production"]["published"] >= 1
+    assert any("build 1 of test" in failure for failure in report["http://staging"]["failed"])
+
+
+def test_publish_to_targets_all_failed():
+    def publish(target):
+        raise ConnectionError("down")
+
+    with pytest.raises(RuntimeError):
+        publish_to_targets(targets=TARGETS, publish=publish, label="build 2 of test")
+
+    # a single target fails as before
+    with pytest.raises(ConnectionError):
+        publish_to_targets(targets=TARGETS[:1], publish=publish, label="build 3 of test")
+
+
+def test_setup_mirrors_drops_failed():
+    def setup(target):
+        if target["url"] == "http://staging":
+            raise ConnectionError("staging is down")
+
+    assert setup_mirrors(mirrors=TARGETS, setup=setup, label="setup of test") == TARGETS[:1]
+    assert any("setup of test" in f for f in get_targets_report()["http://staging"]["failed"])
+
+
+def test_login_mirrors_drops_unreachable():
+    # nothing listens on the discard port
+    mirrors = login_mirrors(
+        specs=["http://127.0.0.1:9"],
+        api_token="",
+        username="admin",
+        password="admin",
+    )
+
+    assert mirrors == []
+    assert any("login" in f for f in get_targets_report()["http://127.0.0.1:9"]["failed"])
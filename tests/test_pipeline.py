@@ -0,0 +1,109 @@
+import json
+import time
+import threading
+
+import pytest
+
+from dana_client.pipeline import BackgroundPublisher
+
+
+def test_publish_in_order():
+    published = []
+    publisher = BackgroundPublisher(max_pending=2)
+
+    for build_id in ["1", "2", "3", "4"]:
+        publisher.submit(build_id, lambda build_id=build_id: published.append(build_id) or build_id)
+
+    results = publisher.join()
+    assert published == ["1", "2", "3", "4"]
+    assert results == {"1": "1", "2": "2", "3": "3", "4": "4"}
+
+
+def test_bounded_queue():
+    release = threading.Event()
+    publisher = BackgroundPublisher(max_pending=1)
+
+    publisher.submit("1", release.wait)
+    # wait for the first build to be running
+    while not publisher.queue.empty():
+        time.sleep(0.01)
+    publisher.submit("2", lambda: None)
+
+    # the queue is full, the next build waits for a slot
+    submitted = threading.Event()
+    thread = threading.Thread(target=lambda: publisher.submit("3", lambda: None) or submitted.set())
+    thread.start()
+    assert not submitted.wait(0.2)
+
+    release.set()
+    assert submitted.wait(5)
+    thread.join()
+    assert sorted(publisher.join()) == ["1", "2", "3"]
+
+
+def test_failure_propagation():
+    release = threading.Event()
+    published = []
+    publisher = BackgroundPublisher(max_pending=2)
+
+    def fail():
+        release.wait()
+        raise ValueError("upload failed")
+
+    publisher.submit("1", fail)
+    publisher.submit("2", lambda: published.append("2"))
+    release.set()
+    # the failure skips the build submitted before it was raised
+    while publisher.error is None or not publisher.queue.empty():
+        time.sleep(0.01)
+
+    # the build is queued before the failure is raised, it isn't lost
+    with pytest.raises(RuntimeError, match="Publishing build 1 failed"):
+        publisher.submit("3", lambda: published.append("3"))
+
+    publisher.submit("4", lambda: published.append("4"))
+    publisher.join()
+    assert published == ["3", "4"]
+    assert publisher.pop_dropped() == (["1"], ["2"])
+    assert publisher.pop_dropped() == ([], [])
+
+
+def test_failure_raised_on_join():
+    publisher = BackgroundPublisher()
+    publisher.submit("1", lambda: 1 / 0)
+
+    with pytest.raises(RuntimeError) as error:
+        publisher.join()
+    assert isinstance(error.value.__cause__, ZeroDivisionError)
+
+
+def test_resume_staged_build(tmp_path, monkeypatch):
+    from git import Repo
+
+    from dana_client import update_project
+
+    repo = Repo.init(tmp_path / "watch_repo")
+    (tmp_path / "watch_repo" / "model.py").write_text("a = 1")
+    repo.index.add(["model.py"])
+    commit = repo.index.commit("code")
+
+    monkeypatch.chdir(tmp_path)
+    staged_build = {"build_id": "1", "build_hash": commit.hexsha, "folder": "staging/1"}
+    update_project.STAGING_DIR.mkdir()
+    (update_project.STAGING_DIR / "1.json").write_text(json.dumps(staged_build))
+
+    def install_commit(**kwargs):
+        raise AssertionError("the staged build was benchmarked again")
+
+    monkeypatch.setattr(update_project, "install_commit", install_commit)
+
+    # without a checkpoint dir
+    build = update_project.run_commit(
+        repo=repo,
+        commit=commit,
+        project_id="project",
+        watch_repo="watch_repo",
+        options=update_project.RunOptions(),
+        staging=False,
+    )
+    assert build == staged_build
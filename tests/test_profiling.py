@@ -0,0 +1,50 @@
+import cProfile
+import xml.etree.ElementTree as ET
+
+from dana_client.profiling import (
+    cprofile_to_collapsed,
+    diff_collapsed,
+    read_collapsed,
+    render_flamegraph,
+    write_collapsed,
+    write_diff_collapsed,
+)
+
+
+def leaf(n):
+    return sum(i * i for i in range(n))
+
+
+def root():
+    return leaf(200_000) + leaf(100_000)
+
+
+def test_cprofile_to_collapsed(tmp_path):
+    profile = cProfile.Profile()
+    profile.runcall(root)
+    profile.dump_stats(tmp_path / "profile")
+
+    stacks = cprofile_to_collapsed(tmp_path / "profile")
+    assert any("root" in stack and "leaf" in stack for stack in stacks)
+    assert all(count > 0 for count in stacks.values())
+
+    write_collapsed(tmp_path / "profile.collapsed", stacks)
+    assert read_collapsed(tmp_path / "profile.collapsed") == stacks
+
+
+def test_flamegraph(tmp_path):
+    before = {"main;forward;matmul": 50, "main;forward;softmax": 50, "main;load": 100}
+    after = {"main;forward;matmul": 150, "main;forward;softmax": 50, "main;load": 100}
+
+    svg = ET.fromstring(render_flamegraph(after, title="a & b"))
+    assert len(svg.findall("{http://www.w3.org/2000/svg}g")) == 5
+
+    diff = diff_collapsed(before, after)
+    assert diff["main;forward;matmul"] == (75, 150)
+    write_diff_collapsed(tmp_path / "profile_diff.collapsed", diff)
+    assert "main;load 150 100" in (tmp_path / "profile_diff.collapsed").read_text()
+
+    svg = render_flamegraph(after, before=before)
+    ET.fromstring(svg)
+    # matmul grew, load shrunk
+    assert "rgb(255," in svg and ",255)" in svg
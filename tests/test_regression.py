@@ -0,0 +1,126 @@
+import pandas as pd
+
+from dana_client.regression import (
+    REGRESSION,
+    IMPROVEMENT,
+    STABLE,
+    INSUFFICIENT,
+    parse_range,
+    bisect_shifts,
+    detect_regressions,
+    detect_shifts,
+    has_regressions,
+)
+
+BASE_VALUES = [10.0, 10.1, 9.9, 10.0, 10.0]
+BENCHMARK_TREND = {
+    "latency(ms)": "smaller",
+    "throughput(tokens)": "higher",
+    "memory(mbytes)": "smaller",
+    "new(ms)": "smaller",
+}
+
+
+def make_history(last_values):
+    rows = []
+    for series_id, values in last_values.items():
+        for build_id, value in enumerate(values, start=1):
+            rows.append({"series_id": series_id, "build_id": build_id, "sample_value": value})
+
+    return pd.DataFrame(rows)
+
+
+def test_parse_range():
+    assert parse_range("5%") == (0.05, True)
+    assert parse_range("0.5") == (0.5, False)
+
+
+def test_detect_regressions():
+    history = make_history(
+        {
+            "latency(ms)": BASE_VALUES + [12.0, 12.0, 12.0],
+            "throughput(tokens)": BASE_VALUES + [12.0, 12.0, 12.0],
+            "memory(mbytes)": BASE_VALUES + [12.0, 10.0, 12.0],
+        }
+    )
+    history = pd.concat(
+        [history, pd.DataFrame([{"series_id": "new(ms)", "build_id": 8, "sample_value": 1.0}])]
+    )
+
+    report = detect_regressions(
+        history=history,
+        build_id=8,
+        benchmark_trend=BENCHMARK_TREND,
+        benchmark_range="5%",
+        benchmark_required=3,
+    ).set_index("series_id")
+
+    assert report.loc["latency(ms)", "status"] == REGRESSION
+    assert report.loc["throughput(tokens)", "status"] == IMPROVEMENT
+    assert report.loc["memory(mbytes)", "status"] == STABLE
+    assert report.loc["new(ms)", "status"] == INSUFFICIENT
+    assert has_regressions(report.reset_index())
+
+
+def test_detect_regressions_ignores_later_builds():
+    history = make_history({"latency(ms)": BASE_VALUES + [10.0, 10.0, 10.0, 20.0, 20.0, 20.0]})
+
+    report = detect_regressions(
+        history=history,
+        build_id=8,
+        benchmark_trend=BENCHMARK_TREND,
+    )
+
+    assert report["status"].tolist() == [STABLE]
+    assert not has_regressions(report)
+
+
+def test_detect_shifts():
+    shifts = detect_shifts(
+        before={"latency(ms)": 10.0, "memory(mbytes)": 100.0, "removed(ms)": 1.0},
+        after={"latency(ms)": 12.0, "memory(mbytes)": 101.0, "new(ms)": 1.0},
+        benchmark_range="5%",
+    )
+
+    assert shifts == {"latency(ms)": 0.2}
+
+
+def test_bisect_shifts():
+    # the latency steps up at commit 200 of 256
+    measured = []
+
+    def measure(index):
+        measured.append(index)
+        return {"latency(ms)": 12.0 if index >= 200 else 10.0, "memory(mbytes)": 100.0}
+
+    culprits = bisect_shifts(num_commits=256, measure=measure, num_samples=2)
+
+    assert culprits == {200: {"latency(ms)": 0.2}}
+    assert len(measured) == len(set(measured))
+    assert len(measured) <= 12
+
+
+def test_bisect_shifts_several_culprits():
+    steps = {37: 1.1, 38: 1.2, 90: 0.8}
+
+    def measure(index):
+        value = 10.0
+        for step, factor in steps.items():
+            if index >= step:
+                value *= factor
+        return {"latency(ms)": value}
+
+    culprits = bisect_shifts(num_commits=100, measure=measure, num_samples=2)
+
+    assert sorted(culprits) == [37, 38, 90]
+
+
+def test_bisect_shifts_stable():
+    measured = []
+
+    def measure(index):
+        measured.append(index)
+        return {"latency(ms)": 10.0}
+
+    assert bisect_shifts(num_commits=256, measure=measure, num_samples=2) == {}
+    assert sorted(measured) == [0, 85, 170, 255]
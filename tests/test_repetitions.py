@@ -0,0 +1,68 @@
+import pytest
+
+from dana_client.build_utils import parse_build
+from dana_client.repetitions import (
+    COMPANION_RANGE,
+    aggregate_values,
+    coefficient_of_variation,
+    find_repetitions,
+    get_series_range,
+    relative_confidence_interval,
+)
+
+VALUES = [10.0, 11.0, 9.0, 10.0, 100.0]
+
+
+def write_results(folder, latency):
+    folder.mkdir(parents=True)
+    (folder / "inference_results.csv").write_text(f"forward.latency(s)\n{latency}\n")
+
+
+def test_aggregate_values():
+    assert aggregate_values(VALUES, "median") == 10.0
+    assert aggregate_values(VALUES, "mean") == 28.0
+    assert aggregate_values([10.0] * 9 + [100.0], "trimmed_mean") == 10.0
+
+    with pytest.raises(ValueError):
+        aggregate_values(VALUES, "mode")
+
+
+def test_dispersion():
+    assert coefficient_of_variation([10.0]) == 0.0
+    assert coefficient_of_variation([9.0, 11.0]) == pytest.approx(14.142, rel=1e-3)
+
+    assert relative_confidence_interval([10.0]) == float("inf")
+    assert relative_confidence_interval([10.0] * 5) == 0.0
+    assert relative_confidence_interval([9.0, 11.0] * 10) < relative_confidence_interval(
+        [9.0, 11.0]
+    )
+
+
+def test_find_repetitions(tmp_path):
+    write_results(tmp_path / "single" / "0", 0.1)
+    assert len(find_repetitions(tmp_path / "single")) == 1
+
+    for repetition in range(3):
+        write_results(tmp_path / "repeated" / "0" / f"rep_{repetition}", 0.1)
+    assert len(find_repetitions(tmp_path / "repeated")) == 3
+
+    write_results(tmp_path / "sweep" / "0", 0.1)
+    write_results(tmp_path / "sweep" / "1", 0.1)
+    assert find_repetitions(tmp_path / "sweep") is None
+
+
+def test_companion_series(tmp_path):
+    for repetition, latency in enumerate([0.010, 0.011, 0.009]):
+        folder = tmp_path / "bert" / "0" / f"rep_{repetition}"
+        write_results(folder, latency)
+        (folder / "hydra_config.yaml").write_text("model: bert\n")
+
+    latency, cv = parse_build(tmp_path)
+
+    assert latency["series_id"] == "bert_latency(ms)"
+    assert not latency.get("companion")
+    assert get_series_range(latency, "5%") == "5%"
+
+    assert cv["series_id"] == "bert_latency(ms)_cv(%)"
+    assert cv["companion"]
+    assert get_series_range(cv, "5%") == COMPANION_RANGE
@@ -0,0 +1,68 @@
+from pathlib import Path
+
+from git import Repo
+
+from dana_client.result_cache import get_cache_key, load_cached_results, save_cached_results
+
+RELEVANT_PATHS = ["src"]
+
+
+def commit_file(repo, path, content, message):
+    file_path = Path(repo.working_tree_dir) / path
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    file_path.write_text(content)
+    repo.index.add([str(path)])
+
+    return repo.index.commit(message)
+
+
+def test_get_cache_key(tmp_path):
+    repo = Repo.init(tmp_path / "watch_repo")
+    config_dir = tmp_path / "benchmarks"
+    config_dir.mkdir()
+    (config_dir / "bert.yaml").write_text("model: bert-base-uncased")
+
+    code_commit = commit_file(repo, "src/model.py", "a = 1", "code")
+    docs_commit = commit_file(repo, "README.md", "docs", "docs")
+    other_code_commit = commit_file(repo, "src/model.py", "a = 2", "more code")
+
+    def key(commit):
+        return get_cache_key(
+            repo=repo,
+            commit=commit,
+            relevant_paths=RELEVANT_PATHS,
+            config_dir=config_dir,
+        )
+
+    assert key(code_commit) == key(docs_commit)
+    assert key(code_commit) != key(other_code_commit)
+
+    docs_key = key(docs_commit)
+    (config_dir / "bert.yaml").write_text("model: bert-large-uncased")
+    assert key(docs_commit) != docs_key
+
+    # a missing relevant path doesn't make different commits share a key
+    def typo_key(commit):
+        return get_cache_key(
+            repo=repo,
+            commit=commit,
+            relevant_paths=["srcs"],
+            config_dir=config_dir,
+        )
+
+    assert typo_key(code_commit) != typo_key(other_code_commit)
+
+
+def test_cached_results(tmp_path):
+    cache_dir = tmp_path / "cache"
+    folder = tmp_path / "experiments"
+    (folder / "bert").mkdir(parents=True)
+    (folder / "bert" / "inference_results.csv").write_text("forward.latency(s)\n0.1\n")
+
+    assert load_cached_results(cache_dir=cache_dir, key="key", folder=folder) is None
+
+    save_cached_results(cache_dir=cache_dir, key="key", build_id="41", folder=folder)
+    restored = tmp_path / "restored"
+
+    assert load_cached_results(cache_dir=cache_dir, key="key", folder=restored) == "41"
+    assert (restored / "bert" / "inference_results.csv").read_text() == "forward.latency(s)\n0.1\n"
@@ -0,0 +1,71 @@
+from huggingface_hub.hf_api import RepoFile, RepoFolder
+
+import dana_client.publish_backup as publish_backup
+
+TREES = {
+    "rev-1": {
+        "project/1/build_info.json": "a",
+        "project/1/bert/inference_results.csv": "b",
+        "project/2/build_info.json": "c",
+        "project/3/build_info.json": "d",
+        "README.md": "e",
+    },
+    "rev-2": {
+        "project/1/build_info.json": "a",
+        "project/1/bert/inference_results.csv": "b",
+        # modified
+        "project/2/build_info.json": "c2",
+        # added
+        "project/4/build_info.json": "f",
+        "other-project/1/build_info.json": "g",
+        "README.md": "e2",
+    },
+}
+
+
+class FakeHfApi:
+    def list_repo_tree(self, repo_id, recursive, revision, repo_type, token):
+        yield RepoFolder(path="project", oid="tree")
+        for path, blob_id in TREES[revision].items():
+            yield RepoFile(path=path, size=1, oid=blob_id)
+
+
+def test_list_changed_builds(monkeypatch):
+    monkeypatch.setattr(publish_backup, "HfApi", FakeHfApi)
+
+    changed = publish_backup.list_changed_builds(
+        dataset_id="dataset",
+        hf_token=None,
+        since_revision="rev-1",
+        revision="rev-2",
+    )
+
+    assert changed == [("other-project", "1"), ("project", "2"), ("project", "4")]
+
+
+def test_sync_state(tmp_path):
+    state_path = tmp_path / "state" / "revisions.json"
+    assert publish_backup.load_sync_state(state_path) == {}
+
+    publish_backup.save_sync_state(state_path, {"dataset http://localhost:7000": "rev-2"})
+    assert publish_backup.load_sync_state(state_path) == {"dataset http://localhost:7000": "rev-2"}
+
+
+def test_sync_state_per_target():
+    urls = ["http://localhost:7000", "http://mirror:7000"]
+    state = {}
+    assert publish_backup.get_since_revision(state=state, dataset_id="dataset", urls=urls) is None
+
+    # the mirror failed, it keeps its (missing) revision
+    publish_backup.update_sync_state(
+        state=state, dataset_id="dataset", urls=urls, revision="rev-1", failed_urls=[urls[1]]
+    )
+    assert state == {"dataset http://localhost:7000": "rev-1"}
+    assert publish_backup.get_since_revision(state=state, dataset_id="dataset", urls=urls) is None
+
+    publish_backup.update_sync_state(
+        state=state, dataset_id="dataset", urls=urls, revision="rev-2", failed_urls=[]
+    )
+    assert (
+        publish_backup.get_since_revision(state=state, dataset_id="dataset", urls=urls) == "rev-2"
+    )
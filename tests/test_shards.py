@@ -0,0 +1,40 @@
+from dana_client.publish_backup import get_project_owner, get_shard
+
+BUILDS = [f"project-{p}/{b}" for p in range(5) for b in range(200)]
+
+
+def test_shards_partition():
+    num_shards = 4
+    shards = [[key for key in BUILDS if get_shard(key, num_shards) == i] for i in range(num_shards)]
+
+    assert sorted(key for shard in shards for key in shard) == sorted(BUILDS)
+    assert all(len(shard) > len(BUILDS) / num_shards / 2 for shard in shards)
+
+
+def test_process_sub_shards():
+    # the processes of a machine split its shard, whatever the number of processes
+    num_shards, processes = 3, 4
+    for shard_index in range(num_shards):
+        shard = {key for key in BUILDS if get_shard(key, num_shards) == shard_index}
+        sub_shards = {
+            key
+            for j in range(processes)
+            for key in BUILDS
+            if get_shard(key, num_shards * processes) == j * num_shards + shard_index
+        }
+        assert sub_shards == shard
+
+
+def test_project_owner():
+    # every project has a single owner, even when the machines run different numbers of processes
+    num_shards, processes = 3, [1, 4, 2]
+    for project in range(50):
+        project_id = f"project-{project}"
+        owners = [
+            (i, j)
+            for i in range(num_shards)
+            for j in range(processes[i])
+            if get_project_owner(project_id, num_shards) == j * num_shards + i
+        ]
+        assert len(owners) == 1
+        assert owners[0][1] == 0
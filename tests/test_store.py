@@ -0,0 +1,83 @@
+from pathlib import Path
+
+from dana_client.store import (
+    connect_store,
+    add_build_samples,
+    get_series_history,
+    get_build_samples,
+    get_project_history,
+)
+
+PROJECT_ID = "test-store-project"
+SERIES = [
+    {
+        "series_id": "bert_latency(ms)",
+        "series_unit": "ms",
+        "series_description": "",
+        "benchmark_trend": "smaller",
+        "sample_value": 10.0,
+    },
+    {
+        "series_id": "bert_memory(mbytes)",
+        "series_unit": "mbytes",
+        "series_description": "",
+        "benchmark_trend": "smaller",
+        "sample_value": 500.0,
+    },
+]
+
+
+def populate_store(store_path: Path, num_builds: int = 5):
+    connection = connect_store(store_path)
+    for build_id in range(1, num_builds + 1):
+        series = [dict(s, sample_value=s["sample_value"] + build_id) for s in SERIES]
+        add_build_samples(
+            connection=connection,
+            project_id=PROJECT_ID,
+            build_id=build_id,
+            series=series,
+        )
+
+    return connection
+
+
+def test_get_series_history(tmp_path):
+    connection = populate_store(tmp_path / "results.db")
+
+    history = get_series_history(
+        connection=connection,
+        project_id=PROJECT_ID,
+        series_id="bert_latency(ms)",
+        last_n=3,
+    )
+
+    assert history["build_id"].tolist() == [3, 4, 5]
+    assert history["sample_value"].tolist() == [13.0, 14.0, 15.0]
+
+
+def test_get_build_samples(tmp_path):
+    connection = populate_store(tmp_path / "results.db")
+
+    samples = get_build_samples(
+        connection=connection,
+        project_id=PROJECT_ID,
+        build_id=2,
+    )
+
+    assert samples["series_id"].tolist() == ["bert_latency(ms)", "bert_memory(mbytes)"]
+    assert samples["series_unit"].tolist() == ["ms", "mbytes"]
+    assert samples["sample_value"].tolist() == [12.0, 502.0]
+
+
+def test_republish_overrides_samples(tmp_path):
+    connection = populate_store(tmp_path / "results.db")
+    connection = populate_store(tmp_path / "results.db")
+
+    history = get_project_history(
+        connection=connection,
+        project_id=PROJECT_ID,
+        last_n=2,
+    )
+
+    assert len(history) == 4
+    assert sorted(history["build_id"].unique().tolist()) == [4, 5]
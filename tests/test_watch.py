@@ -0,0 +1,28 @@
+import heapq
+
+from dana_client.update_project import queue_commits
+
+
+def pop_all(queue):
+    return [heapq.heappop(queue)[1] for _ in range(len(queue))]
+
+
+def test_newest_first():
+    queue = queue_commits(queue=[], new_commits=[(3, "c3"), (1, "c1"), (2, "c2")])
+    assert heapq.heappop(queue)[1] == "c3"
+
+    # a commit pushed while c3 was benchmarked goes before the older ones
+    queue = queue_commits(queue=queue, new_commits=[(4, "c4")])
+    assert pop_all(queue) == ["c4", "c2", "c1"]
+
+
+def test_skip_intermediate():
+    queue = queue_commits(queue=[], new_commits=[(1, "c1"), (2, "c2")], skip_intermediate=True)
+    assert heapq.heappop(queue)[1] == "c2"
+
+    # nothing new fetched, the queue is kept
+    queue = queue_commits(queue=queue, new_commits=[], skip_intermediate=True)
+    assert pop_all(list(queue)) == ["c1"]
+
+    queue = queue_commits(queue=queue, new_commits=[(4, "c4"), (3, "c3")], skip_intermediate=True)
+    assert pop_all(queue) == ["c4", "c3"]